@@ -1,9 +1,38 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
+import copy
+import io
+import logging
 import os
 import uuid
+import zipfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
 from werkzeug.utils import secure_filename
 from simple_face_analyzer import SimpleFaceAnalyzer
+from detectors import create_detector
+from debug_store import DebugPack
+from debug_writer import DebugFrameWriter
+from gallery_store import GalleryStore
+from bulk_enroll import enroll, read_metadata
+from growing_capture import GrowingVideoCapture
+from image_io import decode_image
+from job_profiler import ARTIFACTS, list_artifacts, profile_dir, profile_job
+from jobs import JobQueue
+from logging_setup import configure_logging, fields, queue_stats
+from metrics import ACTIVE_ANALYSES, CONTENT_TYPE, REGISTRY
+from uploads import ChunkedUploads, UploadError
+
+# Structured logs go through a non-blocking queue to stdout. INFO emits
+# job-level events only; DEBUG adds per-frame events and one in
+# SCORE_LOG_SAMPLE_EVERY per-face score lines. LOG_FORMAT: json or text.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+SCORE_LOG_SAMPLE_EVERY = int(os.environ.get('SCORE_LOG_SAMPLE_EVERY', '100'))
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
@@ -12,25 +41,208 @@ CORS(app)
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv'}
+GALLERY_DB = 'gallery.db'
+# Detect on frames downscaled so the smallest accepted face is ~this many
+# pixels (None = detect at full resolution). Trades recall for speed - check
+# benchmarks/bench_detection_resolution.py on your footage before enabling.
+DETECTION_MIN_FACE_PX = None
+# Frames whose longer side is at least this many pixels (4K, panoramic) are
+# detected as overlapping tiles in parallel (None = never tile). Off by default:
+# detectMultiScale already uses OpenCV's threads, and on the measured hardware
+# tiling 4K was slower (benchmarks/bench_detection_resolution.py, "tiled" rows)
+TILED_DETECTION_MIN_SIDE = None
+# Default detector backend for this deployment (haar, lbp, fast, multipose, dnn, mtcnn);
+# requests may pick another one with the "detector" form field
+FACE_DETECTOR = os.environ.get('FACE_DETECTOR', 'haar')
+CASCADE_DETECTOR_OPTIONS = {
+    "detection_min_face_px": DETECTION_MIN_FACE_PX,
+    "tile_min_side": TILED_DETECTION_MIN_SIDE,
+}
+# Sequential video passes run full-frame detection every this many samples and
+# only re-search around the previous faces in between (None = every sample).
+# New faces can be picked up up to N-1 samples late.
+REDETECT_EVERY_N_SAMPLES = None
+# Full video scans reuse the last processed frame's results for sampled frames
+# whose perceptual hash differs by at most this many of 64 bits; None scores
+# every sampled frame. Only for truly frozen feeds: the whole-frame hash does not
+# see a normal-sized face (a 90px face at 1080p flips 0-2 bits, none at 4K), so
+# a missed or moving face would be reused as a duplicate.
+FRAME_DEDUP_HAMMING_THRESHOLD = None
+# Debug crops/frames are written by a background thread: at most this many
+# pending writes (oldest dropped first) and writes per second, at this JPEG quality
+# Packed: one append-only crop store per analysis job (served by /api/debug/<job>)
+# instead of a crop + full-frame JPEG pair per saved face
+DEBUG_FRAMES_DIR = 'debug_frames'
+DEBUG_WRITER_OPTIONS = {"max_queue": 64, "max_per_second": 10, "jpeg_quality": 85, "packed": True}
+# FaceNet embeddings kept for near-identical face crops (LRU, ~2 KB per entry)
+EMBEDDING_CACHE_ENTRIES = 512
+# Sampled video frames stacked into one DNN forward pass (see
+# benchmarks/bench_dnn_batch.py for frames/sec per batch size on your CPU)
+DNN_BATCH_SIZE = int(os.environ.get('DNN_BATCH_SIZE', '8'))
+DETECTOR_OPTIONS = {
+    "haar": CASCADE_DETECTOR_OPTIONS,
+    "lbp": CASCADE_DETECTOR_OPTIONS,
+    "fast": CASCADE_DETECTOR_OPTIONS,
+    "dnn": {"batch_size": DNN_BATCH_SIZE},
+}
+
+# Reference photos are decoded in memory; JPEGs are decoded at reduced scale
+# while that still leaves at least this many pixels on the longer side
+REFERENCE_DECODE_MAX_SIDE = 1600
+# Keep a copy of every uploaded reference photo in uploads/images, written in
+# the background so it never delays the response
+PERSIST_REFERENCE_IMAGES = True
+
+# Queued analyses (resumable uploads) run on this many background workers;
+# finished results are cached by video sha256 + reference + options
+ANALYSIS_WORKERS = 1
+# Analyze-while-uploading: a streaming job reopens the growing file after
+# this much new data, and fails if the upload sends nothing for this long.
+# It holds a worker for the whole upload, so raise ANALYSIS_WORKERS if
+# clients use it alongside regular queued jobs.
+STREAMING_REOPEN_BYTES = 4 * 1024 * 1024
+STREAMING_STALL_TIMEOUT = 300.0
+# Resumable uploads that receive no data for this long are dropped and their
+# partial files deleted
+UPLOAD_MAX_AGE_SECONDS = 24 * 3600
+# Requests may ask for their analysis to run under cProfile ("profile=cpu") or
+# cProfile + tracemalloc ("profile=memory"); off unless JOB_PROFILING=1, since
+# profiling slows the job down. Artifacts go to PROFILES_DIR/<profileId>/.
+JOB_PROFILING_ENABLED = os.environ.get('JOB_PROFILING', '0') == '1'
+PROFILES_DIR = 'profiles'
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024
 
-# Create upload directories
-os.makedirs(os.path.join(UPLOAD_FOLDER, 'images'), exist_ok=True)
-os.makedirs(os.path.join(UPLOAD_FOLDER, 'videos'), exist_ok=True)
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+def get_detector(backend):
+    """Detector backends are built once and shared (they are thread-safe)"""
+    with _detectors_lock:
+        if backend not in _detectors:
+            _detectors[backend] = create_detector(backend, **DETECTOR_OPTIONS.get(backend, {}))
+        return _detectors[backend]
+
+# upload id -> job analyzing that upload while it arrives
+streaming_jobs = {}
+streaming_jobs_lock = threading.Lock()
+
+# Metrics (served by /api/metrics): request latency per route here, gauges in
+# init_services(); analysis counters live in metrics.py
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("faceid_http_request_duration_seconds", "HTTP request latency by route",
+                                          ("route", "method", "status"))
+
+analyzer = gallery = uploads = jobs = persist_pool = gallery_snapshot = None
+
+def init_services():
+    """Logging, directories, the analyzer (models warmed up), gallery, upload sessions and job queue"""
+    global analyzer, gallery, uploads, jobs, persist_pool, gallery_snapshot
+    configure_logging(LOG_LEVEL, LOG_FORMAT)
+    os.makedirs(os.path.join(UPLOAD_FOLDER, 'images'), exist_ok=True)
+    os.makedirs(os.path.join(UPLOAD_FOLDER, 'videos'), exist_ok=True)
+
+    analyzer = SimpleFaceAnalyzer(detector=get_detector(FACE_DETECTOR),
+                                  redetect_every=REDETECT_EVERY_N_SAMPLES,
+                                  dedup_hamming_threshold=FRAME_DEDUP_HAMMING_THRESHOLD,
+                                  embedding_cache_size=EMBEDDING_CACHE_ENTRIES,
+                                  debug_writer=DebugFrameWriter(DEBUG_FRAMES_DIR, **DEBUG_WRITER_OPTIONS),
+                                  score_log_sample_every=SCORE_LOG_SAMPLE_EVERY)
+    gallery = GalleryStore(GALLERY_DB)
+    uploads = ChunkedUploads(os.path.join(UPLOAD_FOLDER, 'chunks'), max_age_seconds=UPLOAD_MAX_AGE_SECONDS)
+    jobs = JobQueue(workers=ANALYSIS_WORKERS)
+    persist_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reference-persist")
+
+    # Keep the gallery and model hot for low-latency identification;
+    # the snapshot is swapped (not mutated) whenever the gallery changes.
+    gallery_snapshot = gallery.load_snapshot()
+    analyzer.warm_up()
 
-# Initialize analyzer
-analyzer = SimpleFaceAnalyzer()
+    # Gauges read at scrape time
+    REGISTRY.gauge("faceid_analysis_jobs", "Queued analysis jobs by state", ("state",)).set_function(
+        lambda: {(state,): count for state, count in jobs.counts().items()})
+    REGISTRY.gauge("faceid_debug_write_queue_depth", "Debug crop writes waiting for the writer thread").set_function(
+        lambda: analyzer.debug_writer.pending() if analyzer.debug_writer is not None else 0)
+    REGISTRY.gauge("faceid_log_queue_depth", "Log records waiting for the log writer thread").set_function(
+        lambda: queue_stats()[0])
+    REGISTRY.gauge("faceid_log_records_dropped", "Log records dropped because the log queue was full").set_function(
+        lambda: queue_stats()[1])
+    REGISTRY.gauge("faceid_embedding_cache_entries", "FaceNet embeddings held in the cache").set_function(
+        lambda: len(analyzer.embedding_cache) if analyzer.embedding_cache is not None else 0)
+    REGISTRY.gauge("faceid_gallery_size", "Faces in the identification gallery snapshot").set_function(
+        lambda: len(gallery_snapshot))
+
+# Bulk-enrollment workers are spawned processes that re-import this file as
+# __mp_main__ (to unpickle their task functions); only the real server
+# process builds the services
+if __name__ != '__mp_main__':
+    init_services()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method,
+                                     status=response.status_code)
+    return response
 
 def allowed_file(filename, allowed_extensions):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
+def request_analyzer():
+    """The shared analyzer, or a per-request view of it using the requested detector backend"""
+    backend = request.form.get('detector')
+    if not backend or backend == FACE_DETECTOR:
+        return analyzer
+    return analyzer.with_detector(get_detector(backend))
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "ML Backend is running!", "port": 5000, "method": "OpenCV Face Detection"})
 
+def save_bytes(path, data):
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        logger.warning("Could not save %s: %s", path, e)
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of the in-process metrics"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def profile_artifacts(profile_id):
+    """Artifacts of a profiled analysis (profileId from its result)"""
+    try:
+        names = list_artifacts(PROFILES_DIR, profile_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify({"profileId": profile_id,
+                    "artifacts": [{"name": name, "url": f"/api/profiles/{profile_id}/{name}"} for name in names]})
+
+@app.route('/api/profiles/<profile_id>/<name>', methods=['GET'])
+def profile_artifact(profile_id, name):
+    """Download one profile artifact (cpu.prof, cpu.txt, memory.txt)"""
+    if name not in ARTIFACTS:
+        return jsonify({"error": "Unknown artifact"}), 404
+    try:
+        directory = os.path.abspath(profile_dir(PROFILES_DIR, profile_id))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not os.path.exists(os.path.join(directory, name)):
+        return jsonify({"error": "Artifact not found"}), 404
+    return send_from_directory(directory, name, as_attachment=True)
+
 @app.route('/api/upload-reference', methods=['POST'])
 def upload_reference():
     try:
@@ -42,14 +254,16 @@ def upload_reference():
             return jsonify({"error": "No file selected"}), 400
         
         if file and allowed_file(file.filename, ALLOWED_IMAGE_EXTENSIONS):
-            filename = secure_filename(f"ref_{uuid.uuid4()}_{file.filename}")
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'images', filename)
-            file.save(filepath)
+            data = file.read()
             
-            # Load reference face
-            success, message = analyzer.load_reference_face(filepath)
+            # Load reference face straight from the uploaded bytes
+            success, message = analyzer.load_reference_image(decode_image(data, REFERENCE_DECODE_MAX_SIDE))
             
             if success:
+                filename = None
+                if PERSIST_REFERENCE_IMAGES:
+                    filename = secure_filename(f"ref_{uuid.uuid4()}_{file.filename}")
+                    persist_pool.submit(save_bytes, os.path.join(app.config['UPLOAD_FOLDER'], 'images', filename), data)
                 return jsonify({
                     "success": True,
                     "message": message,
@@ -63,6 +277,135 @@ def upload_reference():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/gallery/bulk-enroll', methods=['POST'])
+def bulk_enroll():
+    try:
+        if 'archive' not in request.files:
+            return jsonify({"error": "No archive file provided"}), 400
+
+        archive = request.files['archive']
+        if archive.filename == '':
+            return jsonify({"error": "No file selected"}), 400
+
+        if not allowed_file(archive.filename, {'zip'}):
+            return jsonify({"error": "Invalid file type"}), 400
+
+        metadata = {}
+        metadata_file = request.files.get('metadata')
+        if metadata_file and metadata_file.filename != '':
+            if not allowed_file(metadata_file.filename, {'csv'}):
+                return jsonify({"error": "Metadata must be a CSV file"}), 400
+            metadata = read_metadata(io.TextIOWrapper(metadata_file.stream, encoding='utf-8', newline=''))
+
+        workers = request.form.get('workers', type=int)
+        report = enroll(archive.stream, metadata, analyzer, gallery, workers=workers)
+
+        global gallery_snapshot
+        gallery_snapshot = gallery.load_snapshot()
+        return jsonify(report)
+
+    except zipfile.BadZipFile:
+        return jsonify({"error": "Archive is not a valid zip file"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/identify-image', methods=['POST'])
+def identify_image():
+    try:
+        if 'image' not in request.files:
+            return jsonify({"error": "No image file provided"}), 400
+
+        file = request.files['image']
+        if file.filename == '':
+            return jsonify({"error": "No file selected"}), 400
+
+        if not allowed_file(file.filename, ALLOWED_IMAGE_EXTENSIONS):
+            return jsonify({"error": "Invalid file type"}), 400
+
+        snapshot = gallery_snapshot
+        if len(snapshot) == 0:
+            return jsonify({"error": "Gallery is empty - enroll a watchlist first"}), 400
+
+        start = time.perf_counter()
+        # Decode in memory; probe images are never written to uploads/images
+        img = cv2.imdecode(np.frombuffer(file.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return jsonify({"error": "Could not read image"}), 400
+
+        top_k = max(1, request.form.get('top_k', default=5, type=int))
+        faces = request_analyzer().identify_image(img, snapshot, top_k=top_k)
+
+        return jsonify({
+            "success": True,
+            "faces": faces,
+            "facesDetected": len(faces),
+            "gallerySize": len(snapshot),
+            "elapsedMs": round((time.perf_counter() - start) * 1000.0, 2)
+        })
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def analysis_options(form):
+    """Analysis mode and its parameters from a request form"""
+    mode = form.get('mode', 'full')
+    if mode not in ('full', 'coarse_to_fine', 'exists'):
+        raise ValueError(f"Unknown analysis mode: {mode}")
+    profile = form.get('profile') or None
+    if profile not in (None, 'cpu', 'memory'):
+        raise ValueError(f"Unknown profile option: {profile} (cpu or memory)")
+    if profile and not JOB_PROFILING_ENABLED:
+        raise ValueError("Job profiling is disabled on this server (set JOB_PROFILING=1)")
+    return {
+        "mode": mode,
+        "refine": form.get('refine', '').lower() in ('1', 'true', 'yes'),
+        "coarse_interval": form.get('coarse_interval', default=2.0, type=float),
+        # None: derived from the analyzer's strict threshold
+        "coarse_threshold": form.get('coarse_threshold', default=None, type=float),
+        "dense_every_n_frames": max(1, form.get('dense_every_n_frames', default=1, type=int)),
+        "min_coverage": form.get('min_coverage', default=1.0, type=float),
+        "profile": profile,
+    }
+
+def run_analysis(job_analyzer, filepath, options, capture=None):
+    """
+    capture: GrowingVideoCapture of an upload still arriving (mode full only).
+    With options["profile"] the job runs under the profiler and the result
+    gets a "profiling" block naming its artifacts.
+    """
+    if options.get("profile"):
+        result, profiling = profile_job(lambda: analyze(job_analyzer, filepath, options, capture),
+                                        PROFILES_DIR, uuid.uuid4().hex, memory=options["profile"] == 'memory')
+        result["profiling"] = profiling
+        return result
+    return analyze(job_analyzer, filepath, options, capture)
+
+def analyze(job_analyzer, filepath, options, capture=None):
+    mode = options["mode"]
+    logger.info("Analysis requested", extra=fields(mode=mode, video=os.path.basename(filepath)))
+    ACTIVE_ANALYSES.inc()
+    try:
+        if mode == 'coarse_to_fine':
+            return job_analyzer.analyze_video_coarse_to_fine(filepath,
+                                                             coarse_interval_seconds=options["coarse_interval"],
+                                                             coarse_threshold=options["coarse_threshold"],
+                                                             dense_every_n_frames=options["dense_every_n_frames"])
+        if mode == 'exists':
+            return job_analyzer.find_first_appearance(filepath, min_coverage=options["min_coverage"],
+                                                      refine=options["refine"])
+        return job_analyzer.analyze_video(filepath, refine=options["refine"], capture=capture)
+    finally:
+        ACTIVE_ANALYSES.dec()
+
+def analysis_cache_key(job_analyzer, sha256, options):
+    """Same video content + reference + detector/threshold + options => same result (None: do not cache)"""
+    if options.get("profile"):
+        return None  # a profiling request wants a fresh run
+    return (sha256, job_analyzer.reference_fingerprint(), getattr(job_analyzer.detector, 'name', None),
+            job_analyzer.confidence_threshold, tuple(sorted(options.items())))
+
 @app.route('/api/analyze-video', methods=['POST'])
 def analyze_video():
     try:
@@ -74,12 +417,12 @@ def analyze_video():
             return jsonify({"error": "No file selected"}), 400
         
         if file and allowed_file(file.filename, ALLOWED_VIDEO_EXTENSIONS):
+            options = analysis_options(request.form)
             filename = secure_filename(f"video_{uuid.uuid4()}_{file.filename}")
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'videos', filename)
             file.save(filepath)
             
-            print("🎬 Starting REAL face detection analysis...")
-            result = analyzer.analyze_video(filepath)
+            result = run_analysis(request_analyzer(), filepath, options)
             
             if "error" in result:
                 return jsonify({"error": result["error"]}), 400
@@ -88,12 +431,176 @@ def analyze_video():
         else:
             return jsonify({"error": "Invalid file type"}), 400
             
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def upload_error(e):
+    body = {"error": str(e)}
+    if e.offset is not None:
+        body["offset"] = e.offset
+    return jsonify(body), e.status
+
+@app.route('/api/uploads', methods=['POST'])
+def upload_init():
+    """Start a resumable video upload (form or JSON: filename, size)"""
+    data = request.get_json(silent=True) or request.form
+    filename = data.get('filename') or ''
+    if not allowed_file(filename, ALLOWED_VIDEO_EXTENSIONS):
+        return jsonify({"error": "Invalid file type"}), 400
+    size = data.get('size')
+    try:
+        size = int(size) if size is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "size must be an integer"}), 400
+    return jsonify(uploads.init(secure_filename(filename), size)), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Current offset of an upload, to resume after a dropped connection"""
+    try:
+        return jsonify(uploads.status(upload_id))
+    except UploadError as e:
+        return upload_error(e)
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Append the raw request body at ?offset= (must equal the current offset)"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({"error": "offset query parameter required"}), 400
+    try:
+        return jsonify({"uploadId": upload_id, "offset": uploads.put(upload_id, offset, request.stream)})
+    except UploadError as e:
+        return upload_error(e)
+
+def upload_destination(upload_id):
+    status = uploads.status(upload_id)
+    filename = secure_filename(f"video_{upload_id}_{status['filename']}")
+    return os.path.join(app.config['UPLOAD_FOLDER'], 'videos', filename)
+
+def streaming_job(upload_id):
+    """
+    Job id analyzing upload_id while it arrives, or None. A job that failed
+    (or was already trimmed from the queue) is forgotten, so the upload can be
+    analyzed again or queued normally on /complete. Caller holds streaming_jobs_lock.
+    """
+    job_id = streaming_jobs.get(upload_id)
+    if job_id is None:
+        return None
+    job = jobs.get(job_id)
+    if job is None or job["status"] == "error":
+        del streaming_jobs[upload_id]
+        return None
+    return job_id
+
+@app.route('/api/uploads/<upload_id>/analyze', methods=['POST'])
+def upload_analyze_streaming(upload_id):
+    """
+    Start a full analysis of an upload while it is still arriving (fragmented
+    MP4, MKV, AVI); the job follows the file as chunks come in and finishes
+    after /complete. Same form fields as /api/analyze-video (mode must be full).
+    """
+    try:
+        options = analysis_options(request.form)
+        if options["mode"] != 'full':
+            return jsonify({"error": "Only mode=full can run while uploading"}), 400
+        job_analyzer = copy.copy(request_analyzer())
+        if job_analyzer.reference_face is None:
+            return jsonify({"error": "No reference face loaded"}), 400
+
+        watch = uploads.watch(upload_id)
+        filepath = upload_destination(upload_id)
+        with streaming_jobs_lock:
+            active_job_id = streaming_job(upload_id)
+            if active_job_id is not None:
+                return jsonify({"error": "Upload is already being analyzed", "jobId": active_job_id}), 409
+            capture = GrowingVideoCapture(watch, reopen_bytes=STREAMING_REOPEN_BYTES,
+                                          stall_timeout=STREAMING_STALL_TIMEOUT)
+            job = jobs.submit(lambda: run_analysis(job_analyzer, filepath, options, capture=capture),
+                              cache_key=lambda: watch.sha256 and analysis_cache_key(job_analyzer, watch.sha256, options),
+                              info={"uploadId": upload_id, "mode": options["mode"], "streaming": True})
+            streaming_jobs[upload_id] = job["jobId"]
+        return jsonify({"success": True, **job}), 202
+    except UploadError as e:
+        return upload_error(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def upload_complete(upload_id):
+    """
+    Finish an upload and queue its analysis (same form fields as /api/analyze-video,
+    plus optional sha256). If the upload is already being analyzed while
+    arriving, this only finishes it and returns that job; if that job failed,
+    the completed file is queued like any other upload.
+    """
+    try:
+        with streaming_jobs_lock:
+            streaming_job_id = streaming_job(upload_id)
+        if streaming_job_id is not None:
+            filepath, sha256 = uploads.complete(upload_id, upload_destination(upload_id), request.form.get('sha256'))
+            with streaming_jobs_lock:
+                streaming_jobs.pop(upload_id, None)
+            return jsonify({"success": True, "sha256": sha256, **(jobs.get(streaming_job_id) or {"jobId": streaming_job_id})}), 202
+
+        options = analysis_options(request.form)
+        # Snapshot: later reference uploads must not change a queued job
+        job_analyzer = copy.copy(request_analyzer())
+        if job_analyzer.reference_face is None:
+            return jsonify({"error": "No reference face loaded"}), 400
+
+        filepath, sha256 = uploads.complete(upload_id, upload_destination(upload_id), request.form.get('sha256'))
+        with streaming_jobs_lock:
+            # The upload is finished: nothing will look up a streaming job for it again
+            streaming_jobs.pop(upload_id, None)
+
+        job = jobs.submit(lambda: run_analysis(job_analyzer, filepath, options),
+                          cache_key=analysis_cache_key(job_analyzer, sha256, options),
+                          info={"uploadId": upload_id, "sha256": sha256, "mode": options["mode"]})
+        return jsonify({"success": True, "sha256": sha256, **job}), 202
+    except UploadError as e:
+        return upload_error(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Analysis job state; includes the result once done"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/debug/<job_id>/entries', methods=['GET'])
+def debug_entries(job_id):
+    """Page through one job's saved debug crops (?kind=true|rejected&offset=&limit=)"""
+    try:
+        pack = DebugPack(DEBUG_FRAMES_DIR, job_id)
+        offset = max(0, request.args.get('offset', default=0, type=int))
+        limit = min(500, max(1, request.args.get('limit', default=50, type=int)))
+        total, entries = pack.entries(kind=request.args.get('kind'), offset=offset, limit=limit)
+        return jsonify({"jobId": job_id, "total": total, "offset": offset, "entries": entries})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+
+@app.route('/api/debug/<job_id>/entries/<int:entry_id>', methods=['GET'])
+def debug_entry_image(job_id, entry_id):
+    """One saved debug crop as JPEG"""
+    try:
+        data = DebugPack(DEBUG_FRAMES_DIR, job_id).read(entry_id)
+        return Response(data, mimetype='image/jpeg')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except (FileNotFoundError, KeyError):
+        return jsonify({"error": "Debug entry not found"}), 404
+
 if __name__ == '__main__':
-    print("🚀 Starting Criminal Identification Backend...")
-    print("👤 Using OpenCV Face Detection (More Reliable)")
-    print("🎯 Method: Haar Cascade + Template Matching")
-    print("🌐 Backend running on: http://localhost:5000")
-    app.run(debug=True, port=5000, host='0.0.0.0')
+    logger.info("Starting Criminal Identification Backend", extra=fields(
+        detector=FACE_DETECTOR, url="http://localhost:5000"))
+    # Threaded: concurrent requests share the analyzer; each detection checks a
+    # cascade out of a pool that outlives the per-request threads (see detectors.CascadePool)
+    app.run(debug=True, port=5000, host='0.0.0.0', threaded=True)
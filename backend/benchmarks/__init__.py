@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for the analysis backend.
+Run from backend/, e.g.: python -m benchmarks.bench_detection_resolution
+or the whole pipeline: python -m benchmarks.bench_pipeline (compare runs with
+python -m benchmarks.compare).
+"""
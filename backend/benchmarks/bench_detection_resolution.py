@@ -0,0 +1,80 @@
+# bench_detection_resolution.py
+"""
+Detection time per frame at full resolution vs. the downscaled
+detection-resolution policy (CascadeDetector.detection_min_face_px) and vs.
+tiled detection (CascadeDetector.tile_min_side: frames at least that large
+are scanned as parallel tiles; smaller ones are reported as not tiled).
+
+    python -m benchmarks.bench_detection_resolution --detection-min-face-px 36 48
+    python -m benchmarks.bench_detection_resolution --resolutions 4k --tile-min-side 2560 --tile-workers 4
+
+Recall is measured against the synthetic ground truth (IoU >= 0.5), so the
+speed/recall trade-off of each target size is visible side by side.
+"""
+import argparse
+
+import cv2
+
+from detectors import CascadeDetector, detection_scale
+from benchmarks.common import emit, environment, recall, summarize_ms, time_call
+from benchmarks.synthetic import corpus_digest, make_corpus
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+
+
+def run(resolutions=("720p", "1080p", "4k"), frames=5, min_face_size=90, detection_min_face_px=(36, 48), repeat=3,
+        seed=0, tile_min_side=1920, tile_workers=None):
+    policies = {"full": (1.0, CascadeDetector())}
+    for px in detection_min_face_px:
+        policies[f"{px}px"] = (detection_scale(min_face_size, px), CascadeDetector(detection_min_face_px=px))
+    if tile_min_side:
+        policies["tiled"] = (1.0, CascadeDetector(tile_min_side=tile_min_side, tile_workers=tile_workers))
+
+    results = {"benchmark": "detection_resolution", "environment": environment(),
+               "params": {"frames": frames, "corpus": corpus_digest(), "minFaceSize": min_face_size,
+                          "detectionMinFacePx": list(detection_min_face_px), "tileMinSide": tile_min_side,
+                          "tileWorkers": tile_workers, "repeat": repeat, "seed": seed},
+               "results": []}
+
+    for name in resolutions:
+        width, height = RESOLUTIONS[name]
+        corpus = make_corpus(width, height, n_frames=frames, face_size_range=(min_face_size, min_face_size * 3),
+                             seed=seed)
+        grays = [(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), boxes) for frame, boxes in corpus]
+
+        for policy, (scale, detector) in policies.items():
+            durations = []
+            recalls = []
+            for gray, boxes in grays:
+                faces, ms = time_call(lambda: detector.detect(gray, 1.25, 6, min_face_size), repeat=repeat)
+                durations.extend(ms)
+                recalls.append(recall([list(f) for f in faces], boxes))
+            entry = {"resolution": name, "policy": policy, "scale": round(scale, 3),
+                     "tiled": bool(detector.tile_min_side and max(width, height) * scale >= detector.tile_min_side),
+                     "recall": round(sum(recalls) / len(recalls), 3), **summarize_ms(durations)}
+            results["results"].append(entry)
+            print(f"⏱️ {name:>6} {policy:>6} (x{scale:.2f}{', tiled' if entry['tiled'] else ''}): "
+                  f"{entry['meanMs']:8.1f} ms/frame | recall {entry['recall']:.2f}")
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--min-face-size", type=int, default=90)
+    parser.add_argument("--detection-min-face-px", type=int, nargs="+", default=[36, 48])
+    parser.add_argument("--tile-min-side", type=int, default=1920,
+                        help="add a tiled policy for frames at least this large (0 = no tiled policy)")
+    parser.add_argument("--tile-workers", type=int, help="tile threads (default: ThreadPoolExecutor's)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+    emit(run(args.resolutions, args.frames, args.min_face_size, args.detection_min_face_px, args.repeat, args.seed,
+             args.tile_min_side, args.tile_workers), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_detectors.py
+"""
+Compare face detector backends (haar, lbp, fast, multipose, dnn, mtcnn) on a
+fixed synthetic corpus: frames/sec, faces/sec (ground-truth faces processed
+per second) and recall at IoU >= 0.5. Backends whose model files or
+dependencies are missing are reported as skipped.
+
+    python -m benchmarks.bench_detectors --resolution 1080p --frames 10
+"""
+import argparse
+
+import cv2
+
+from detectors import DETECTOR_BACKENDS, create_detector
+from benchmarks.common import emit, environment, recall, summarize_ms, time_call
+from benchmarks.synthetic import RESOLUTIONS, corpus_digest, make_corpus
+
+
+def bench_detector(detector, corpus, min_face_size, repeat=1):
+    """Time detector over (frame, boxes) corpus; returns metrics dict"""
+    durations = []
+    recalls = []
+    faces_total = 0
+    for frame, boxes in corpus:
+        source = frame if detector.needs_color else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces, ms = time_call(lambda: detector.detect(source, 1.25, 6, min_face_size), repeat=repeat)
+        durations.append(min(ms))
+        recalls.append(recall([list(f) for f in faces], boxes))
+        faces_total += len(boxes)
+
+    seconds = sum(durations) / 1000.0
+    return {
+        "framesPerSec": round(len(corpus) / seconds, 2) if seconds > 0 else None,
+        "facesPerSec": round(faces_total / seconds, 2) if seconds > 0 else None,
+        "recall": round(sum(recalls) / len(recalls), 3),
+        **summarize_ms(durations)
+    }
+
+
+def run(backends=None, resolution="1080p", frames=10, faces=3, min_face_size=90, repeat=1, seed=0):
+    width, height = RESOLUTIONS[resolution]
+    corpus = make_corpus(width, height, n_frames=frames, n_faces=faces,
+                         face_size_range=(min_face_size, min_face_size * 3), seed=seed)
+    results = {"benchmark": "detectors", "environment": environment(),
+               "params": {"resolution": resolution, "frames": frames, "corpus": corpus_digest(), "faces": faces,
+                          "minFaceSize": min_face_size, "repeat": repeat, "seed": seed},
+               "results": []}
+
+    for backend in backends or list(DETECTOR_BACKENDS):
+        try:
+            detector = create_detector(backend)
+        except ValueError as e:
+            results["results"].append({"backend": backend, "skipped": str(e)})
+            print(f"⏭️ {backend:>6}: skipped ({e})")
+            continue
+        metrics = bench_detector(detector, corpus, min_face_size, repeat)
+        results["results"].append({"backend": backend, **metrics})
+        print(f"⏱️ {backend:>6}: {metrics['framesPerSec']} frames/s | {metrics['facesPerSec']} faces/s | "
+              f"recall {metrics['recall']:.2f}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=list(DETECTOR_BACKENDS))
+    parser.add_argument("--resolution", default="1080p", choices=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--faces", type=int, default=3, help="faces per frame")
+    parser.add_argument("--min-face-size", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+    emit(run(args.backends, args.resolution, args.frames, args.faces, args.min_face_size, args.repeat, args.seed),
+         args.output)
+
+
+if __name__ == "__main__":
+    main()
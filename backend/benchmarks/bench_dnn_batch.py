@@ -0,0 +1,78 @@
+# bench_dnn_batch.py
+"""
+Throughput of the OpenCV DNN SSD face detector versus batch size: sampled
+frames are stacked with cv2.dnn.blobFromImages and run in one forward pass
+per batch. Reports frames/sec per batch size on the current CPU.
+
+    python -m benchmarks.bench_dnn_batch --resolution 1080p --frames 32 --batch-sizes 1 2 4 8 16
+"""
+import argparse
+
+import cv2
+
+from detectors import DnnSsdDetector
+from benchmarks.common import emit, environment, recall, summarize_ms, time_call
+from benchmarks.synthetic import RESOLUTIONS, corpus_digest, make_corpus
+
+
+def bench_batch_size(detector, frames, boxes, min_face_size, repeat=1):
+    """Time detect_batch over all frames at detector.batch_size; returns metrics dict"""
+    detections, ms = time_call(lambda: detector.detect_batch(frames, min_face_size=min_face_size), repeat=repeat)
+    seconds = min(ms) / 1000.0
+    recalls = [recall([list(f) for f in faces], truth) for faces, truth in zip(detections, boxes)]
+    return {
+        "framesPerSec": round(len(frames) / seconds, 2) if seconds > 0 else None,
+        "recall": round(sum(recalls) / len(recalls), 3),
+        **summarize_ms(ms)
+    }
+
+
+def run(batch_sizes=(1, 2, 4, 8, 16), resolution="1080p", frames=32, faces=3, min_face_size=90,
+        repeat=1, threads=None, model_dir=None, seed=0):
+    width, height = RESOLUTIONS[resolution]
+    corpus = make_corpus(width, height, n_frames=frames, n_faces=faces,
+                         face_size_range=(min_face_size, min_face_size * 3), seed=seed)
+    images = [frame for frame, _ in corpus]
+    truth = [boxes for _, boxes in corpus]
+    if threads is not None:
+        cv2.setNumThreads(threads)
+    results = {"benchmark": "dnn_batch", "environment": environment(),
+               "params": {"resolution": resolution, "frames": frames, "corpus": corpus_digest(), "faces": faces,
+                          "minFaceSize": min_face_size, "repeat": repeat, "threads": cv2.getNumThreads(),
+                          "seed": seed},
+               "results": []}
+
+    for batch_size in batch_sizes:
+        try:
+            detector = DnnSsdDetector(model_dir=model_dir, batch_size=batch_size)
+        except ValueError as e:
+            results["results"].append({"batchSize": batch_size, "skipped": str(e)})
+            print(f"⏭️ dnn: skipped ({e})")
+            break
+        # First forward pass allocates the net's buffers for this batch shape
+        detector.detect_batch(images[:batch_size], min_face_size=min_face_size)
+        metrics = bench_batch_size(detector, images, truth, min_face_size, repeat)
+        results["results"].append({"batchSize": batch_size, **metrics})
+        print(f"⏱️ batch {batch_size:>3}: {metrics['framesPerSec']} frames/s | recall {metrics['recall']:.2f}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--resolution", default="1080p", choices=list(RESOLUTIONS))
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--faces", type=int, default=3, help="faces per frame")
+    parser.add_argument("--min-face-size", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None, help="cv2.setNumThreads (default: OpenCV's choice)")
+    parser.add_argument("--model-dir", default=None, help="directory with the res10 SSD Caffe files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+    emit(run(args.batch_sizes, args.resolution, args.frames, args.faces, args.min_face_size, args.repeat,
+             args.threads, args.model_dir, args.seed), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# bench_pipeline.py
+"""
+End-to-end benchmark of the analysis pipeline on deterministic synthetic
+data (see synthetic.py):
+
+  reference  load_reference_face (disk) and load_reference_image (in-memory
+             decode) for reference photos of increasing size
+  scorers    compare_faces_strict (full and cheap) on real face crops, with
+             the per-scorer breakdown (features, template, ssim, facenet)
+  analyze    analyze_video over synthetic clips at several resolutions and
+             face counts: frames/sec, the stage profile, and matches inside /
+             outside the target's known on-screen window
+  detectors  every detector backend (bench_detectors)
+
+    python -m benchmarks.bench_pipeline --output before.json
+    python -m benchmarks.bench_pipeline --suites analyze --resolutions 1080p --faces 1 4
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import os
+import tempfile
+
+import cv2
+
+from image_io import decode_image
+from simple_face_analyzer import SimpleFaceAnalyzer
+from benchmarks import bench_detectors
+from benchmarks.common import emit, environment, summarize_ms, time_call
+from benchmarks.synthetic import RESOLUTIONS, corpus_digest, load_face_crops, make_reference_image, make_video
+
+SUITES = ("reference", "scorers", "analyze", "detectors")
+REFERENCE_SIDES = (480, 1080, 2160, 4320)
+
+
+def new_analyzer(threshold):
+    # No debug writes: they would time the writer thread's queue, not the pipeline
+    return SimpleFaceAnalyzer(confidence_threshold=threshold, debug_save=False, dedup_hamming_threshold=None)
+
+
+def bench_reference(analyzer, workdir, crops, repeat):
+    results = []
+    for side in REFERENCE_SIDES:
+        path = os.path.join(workdir, f"reference_{side}.jpg")
+        if not os.path.exists(path):
+            make_reference_image(path, crops, size=side, face_size=int(side * 0.6))
+        with open(path, 'rb') as f:
+            data = f.read()
+        (ok, message), disk_ms = time_call(lambda: analyzer.load_reference_face(path), repeat)
+        _, memory_ms = time_call(lambda: analyzer.load_reference_image(decode_image(data, 1600)), repeat)
+        results.append({"case": f"reference/{side}px", "loaded": ok, "message": message,
+                        "fromDisk": summarize_ms(disk_ms), "inMemory": summarize_ms(memory_ms)})
+        print(f"⏱️ reference {side:>5}px: disk {summarize_ms(disk_ms)['medianMs']} ms | "
+              f"in-memory {summarize_ms(memory_ms)['medianMs']} ms")
+    return results
+
+
+def bench_scorers(analyzer, reference_path, crops, repeat):
+    analyzer.load_reference_face(reference_path)
+    faces = [cv2.cvtColor(c, cv2.COLOR_BGR2GRAY) for c in crops]
+    results = []
+    for cheap in (False, True):
+        analyzer.profiler.reset()
+        _, durations = time_call(lambda: [analyzer.compare_faces_strict(f, cheap=cheap) for f in faces], repeat)
+        per_face = [d / len(faces) for d in durations]
+        results.append({"case": "compare_faces_strict/" + ("cheap" if cheap else "full"),
+                        "faces": len(faces), "facesPerSec": round(1000.0 / min(per_face), 2),
+                        **summarize_ms(per_face), "scorers": analyzer.profiler.summary()})
+        print(f"⏱️ compare_faces_strict ({'cheap' if cheap else 'full'}): {results[-1]['facesPerSec']} faces/s")
+    return results
+
+
+def bench_analyze(threshold, workdir, reference_path, resolutions, face_counts, seconds, fps, every, seed):
+    results = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for faces in face_counts:
+            path = os.path.join(workdir, f"clip_{resolution}_{faces}f_{seconds}s_{fps}fps_{seed}.avi")
+            truth = make_video(path, width, height, seconds=seconds, fps=fps, n_faces=faces,
+                               face_size_range=(height // 6, height // 3), seed=seed)
+            analyzer = new_analyzer(threshold)
+            analyzer.load_reference_face(reference_path)
+            result, durations = time_call(lambda: analyzer.analyze_video(path, process_every_n_frames=every, save_matches=False), 1)
+            if "error" in result:
+                results.append({"case": f"analyze/{resolution}-{faces}faces", "error": result["error"]})
+                continue
+            wall = durations[0] / 1000.0
+            in_window = [m for m in result["timestamps"]
+                         if truth["targetFirstFrame"] <= m["frame"] <= truth["targetLastFrame"]]
+            results.append({
+                "case": f"analyze/{resolution}-{faces}faces",
+                "resolution": resolution, "faces": faces, "frames": truth["frames"], "everyNFrames": every,
+                "wallMs": round(durations[0], 1),
+                "framesPerSec": round(result["totalFramesProcessed"] / wall, 2),
+                "sampledFramesPerSec": round(result["totalFramesProcessed"] / every / wall, 2),
+                "facesDetected": result["totalFacesDetected"],
+                "matchesInTargetWindow": len(in_window),
+                "matchesOutsideTargetWindow": len(result["timestamps"]) - len(in_window),
+                "profile": result.get("profile", {}),
+            })
+            print(f"⏱️ analyze {resolution:>5} {faces} faces: {results[-1]['framesPerSec']} frames/s | "
+                  f"matches in/out of target window {len(in_window)}/{results[-1]['matchesOutsideTargetWindow']}")
+    return results
+
+
+def run(suites=SUITES, resolutions=("720p", "1080p"), face_counts=(1, 4), seconds=10, fps=15, every=5,
+        threshold=60, repeat=3, seed=0, workdir=None):
+    workdir = workdir or tempfile.mkdtemp(prefix="face-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    crops = load_face_crops()
+    reference_path = make_reference_image(os.path.join(workdir, "reference.jpg"), crops, seed=seed)
+    analyzer = new_analyzer(threshold)
+
+    results = {"benchmark": "pipeline", "environment": environment(),
+               "params": {"suites": list(suites), "resolutions": list(resolutions), "faces": list(face_counts),
+                          "seconds": seconds, "fps": fps, "everyNFrames": every, "threshold": threshold,
+                          "repeat": repeat, "seed": seed, "facenet": analyzer.use_facenet,
+                          "corpus": corpus_digest()},
+               "results": {}}
+    if "reference" in suites:
+        results["results"]["reference"] = bench_reference(analyzer, workdir, crops, repeat)
+    if "scorers" in suites:
+        results["results"]["scorers"] = bench_scorers(analyzer, reference_path, crops, repeat)
+    if "analyze" in suites:
+        results["results"]["analyze"] = bench_analyze(threshold, workdir, reference_path, resolutions, face_counts,
+                                                      seconds, fps, every, seed)
+    if "detectors" in suites:
+        results["results"]["detectors"] = bench_detectors.run(resolution=resolutions[-1], frames=5, seed=seed)["results"]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", nargs="+", default=list(SUITES), choices=SUITES)
+    parser.add_argument("--resolutions", nargs="+", default=["720p", "1080p"], choices=list(RESOLUTIONS))
+    parser.add_argument("--faces", nargs="+", type=int, default=[1, 4], help="distractor faces per clip")
+    parser.add_argument("--seconds", type=int, default=10, help="clip duration")
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--every", type=int, default=5, help="process_every_n_frames for analyze_video")
+    parser.add_argument("--threshold", type=float, default=60,
+                        help="confidence threshold (the classical scorers rarely pass the production 85)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="where synthetic clips/images are written (default: a temp dir)")
+    parser.add_argument("--output", help="write JSON results to this file")
+    args = parser.parse_args(argv)
+    emit(run(args.suites, args.resolutions, args.faces, args.seconds, args.fps, args.every, args.threshold,
+             args.repeat, args.seed, args.workdir), args.output)
+
+
+if __name__ == "__main__":
+    main()
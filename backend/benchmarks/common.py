@@ -0,0 +1,82 @@
+# common.py
+"""Shared helpers for benchmark scripts: timing, recall and JSON output."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+
+def time_call(fn, repeat=3):
+    """Run fn repeat times; returns (last_result, list of durations in ms)"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append((time.perf_counter() - start) * 1000.0)
+    return result, durations
+
+
+def summarize_ms(durations):
+    arr = np.asarray(durations, dtype=np.float64)
+    return {
+        "meanMs": round(float(arr.mean()), 3),
+        "medianMs": round(float(np.median(arr)), 3),
+        "minMs": round(float(arr.min()), 3),
+        "n": int(arr.size)
+    }
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / float(union) if union > 0 else 0.0
+
+
+def recall(detections, truth, threshold=0.5):
+    """Fraction of ground-truth boxes matched by some detection with IoU >= threshold"""
+    if not truth:
+        return 1.0
+    hit = sum(1 for t in truth if any(iou(t, d) >= threshold for d in detections))
+    return hit / float(len(truth))
+
+
+def git_commit():
+    """Current commit of the checkout (None outside a git work tree), so results can be compared between commits"""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def environment():
+    return {
+        "python": sys.version.split()[0],
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpuThreads": cv2.getNumThreads(),
+        "commit": git_commit()
+    }
+
+
+def emit(results, output=None):
+    """Write results as JSON to output (path) or stdout"""
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + "\n")
+        print(f"📝 Results written to {output}")
+    else:
+        print(text)
@@ -0,0 +1,102 @@
+# compare.py
+"""
+Compare two benchmark JSON files (e.g. from two commits) and flag
+regressions. Timings (keys ending in Ms) are lower-is-better, rates
+(ending in PerSec) and recall are higher-is-better; other values are
+ignored. List entries are matched by their "case" / "backend" name.
+
+    python -m benchmarks.compare before.json after.json --tolerance 0.1
+
+Exits 1 if any metric got worse by more than the tolerance (relative).
+"""
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = ("PerSec", "recall")
+LOWER_IS_BETTER = ("Ms",)
+# Sums over however many runs happened; not comparable on their own
+IGNORED = ("totalMs", "minMs")
+
+
+def flatten(value, prefix=""):
+    """{path: number} for every numeric leaf; list items are keyed by case/backend when they have one"""
+    leaves = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            leaves.update(flatten(item, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            name = index
+            if isinstance(item, dict):
+                name = item.get("case", item.get("backend", index))
+            leaves.update(flatten(item, f"{prefix}[{name}]"))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        leaves[prefix] = value
+    return leaves
+
+
+def direction(path):
+    """+1 higher is better, -1 lower is better, 0 not compared"""
+    key = path.rsplit(".", 1)[-1]
+    if key in IGNORED:
+        return 0
+    if key.endswith(HIGHER_IS_BETTER):
+        return 1
+    if key.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(old, new, tolerance=0.1):
+    """Rows of (path, old, new, relative change, status) for metrics present in both"""
+    old_leaves, new_leaves = flatten(old.get("results", old)), flatten(new.get("results", new))
+    rows = []
+    for path in sorted(set(old_leaves) & set(new_leaves)):
+        sign = direction(path)
+        if sign == 0:
+            continue
+        before, after = old_leaves[path], new_leaves[path]
+        change = (after - before) / abs(before) if before else 0.0
+        if change * sign < -tolerance:
+            status = "regression"
+        elif change * sign > tolerance:
+            status = "improvement"
+        else:
+            status = "same"
+        rows.append((path, before, after, change, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change treated as noise")
+    parser.add_argument("--all", action="store_true", help="also list metrics within the tolerance")
+    args = parser.parse_args(argv)
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"📊 {old.get('environment', {}).get('commit')} -> {new.get('environment', {}).get('commit')}")
+    old_params, new_params = old.get("params", {}), new.get("params", {})
+    if old_params.get("corpus") != new_params.get("corpus"):
+        print(f"⚠️ Input face corpus differs ({old_params.get('corpus')} vs {new_params.get('corpus')}); "
+              f"results are not comparable")
+    elif old_params != new_params:
+        print("⚠️ Benchmark parameters differ; results may not be comparable")
+    marks = {"regression": "❌", "improvement": "✅", "same": "  "}
+    rows = compare(old, new, args.tolerance)
+    for path, before, after, change, status in rows:
+        if status != "same" or args.all:
+            print(f"{marks[status]} {path}: {before:g} -> {after:g} ({change:+.1%})")
+    regressions = sum(1 for row in rows if row[4] == "regression")
+    print(f"{len(rows)} metrics compared: {regressions} regressions, "
+          f"{sum(1 for row in rows if row[4] == 'improvement')} improvements (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+# synthetic.py
+"""
+Deterministic synthetic benchmark data: face crops composited onto cluttered
+backgrounds with known ground-truth boxes. The crops are a fixed fixture set
+vendored in benchmarks/faces/ (never the live debug_frames/ output, which
+analysis runs keep adding to); corpus_digest() fingerprints whichever set is
+used so runs on different inputs can be told apart. The same seed and faces
+always produce the same frames, videos and reference images.
+
+make_video() writes a clip where faces drift across a fixed background and
+one "target" face (see target_crop) is on screen for a known frame range;
+make_reference_image() writes a reference photo of that target, so the whole
+analysis pipeline can be benchmarked and checked for accuracy end to end.
+"""
+import glob
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+DEFAULT_FACES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'faces')
+FACE_PATTERNS = ('*.jpg', '*.png')
+
+RESOLUTIONS = {"480p": (854, 480), "720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+
+
+def face_paths(faces_dir=None, limit=32):
+    """Up to limit face image paths in faces_dir (default: the vendored fixtures), in a stable order"""
+    faces_dir = faces_dir or DEFAULT_FACES_DIR
+    paths = sorted(p for pattern in FACE_PATTERNS for p in glob.glob(os.path.join(faces_dir, pattern)))
+    return paths[:limit]
+
+
+def load_face_crops(faces_dir=None, limit=32):
+    """Load up to limit face crops (BGR) from faces_dir, in a stable order"""
+    crops = [img for img in (cv2.imread(p) for p in face_paths(faces_dir, limit)) if img is not None]
+    if not crops:
+        raise RuntimeError(f"No face images found in {faces_dir or DEFAULT_FACES_DIR} (expected *.jpg / *.png)")
+    return crops
+
+
+def corpus_digest(faces_dir=None, limit=32):
+    """Short SHA-256 over the face images load_face_crops would use (names and bytes)"""
+    digest = hashlib.sha256()
+    for path in face_paths(faces_dir, limit):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def make_background(width, height, rng):
+    """Gradient + noise + random rectangles, so detectors see some clutter"""
+    xs = np.linspace(0, 1, width, dtype=np.float32)
+    ys = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    base = (60 + 80 * xs[None, :] * 0.5 + 80 * ys * 0.5)
+    frame = np.repeat(base[:, :, None], 3, axis=2)
+    frame += rng.normal(0, 6, size=frame.shape).astype(np.float32)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+    for _ in range(12):
+        x0, y0 = int(rng.integers(0, width)), int(rng.integers(0, height))
+        x1, y1 = x0 + int(rng.integers(20, max(21, width // 6))), y0 + int(rng.integers(20, max(21, height // 6)))
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        cv2.rectangle(frame, (x0, y0), (x1, y1), color, thickness=-1)
+    return frame
+
+
+def make_frame(width, height, crops, n_faces, face_size_range, rng, background=None):
+    """
+    Composite n_faces random crops at random non-overlapping positions.
+    Returns (frame, boxes) with boxes as [x, y, w, h].
+    """
+    frame = make_background(width, height, rng) if background is None else background.copy()
+    boxes = []
+    attempts = 0
+    while len(boxes) < n_faces and attempts < 50 * max(1, n_faces):
+        attempts += 1
+        size = int(rng.integers(face_size_range[0], face_size_range[1] + 1))
+        if size >= min(width, height):
+            continue
+        x = int(rng.integers(0, width - size))
+        y = int(rng.integers(0, height - size))
+        if any(x < bx + bw and bx < x + size and y < by + bh and by < y + size for bx, by, bw, bh in boxes):
+            continue
+        crop = crops[int(rng.integers(0, len(crops)))]
+        frame[y:y+size, x:x+size] = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+        boxes.append([x, y, size, size])
+    return frame, boxes
+
+
+def make_corpus(width, height, n_frames=5, n_faces=3, face_size_range=(90, 270), seed=0, faces_dir=None):
+    """Fixed list of (frame, boxes) for one resolution"""
+    rng = np.random.default_rng(seed)
+    crops = load_face_crops(faces_dir)
+    return [make_frame(width, height, crops, n_faces, face_size_range, rng) for _ in range(n_frames)]
+
+
+def target_crop(crops):
+    """The crop used as the video's target person (the largest, for a clean reference)"""
+    return max(crops, key=lambda c: c.shape[0] * c.shape[1])
+
+
+def make_reference_image(path, crops, size=480, face_size=300, seed=0):
+    """Write a reference photo: the target face centred on a size x size background"""
+    rng = np.random.default_rng(seed)
+    image = make_background(size, size, rng)
+    offset = (size - face_size) // 2
+    image[offset:offset+face_size, offset:offset+face_size] = cv2.resize(target_crop(crops), (face_size, face_size),
+                                                                         interpolation=cv2.INTER_AREA)
+    cv2.imwrite(path, image)
+    return path
+
+
+def make_video(path, width, height, seconds=10, fps=15, n_faces=2, face_size_range=(120, 240), target_window=(0.4, 0.7),
+               seed=0, faces_dir=None, fourcc='MJPG'):
+    """
+    Write a synthetic clip: n_faces distractor faces drift (and bounce) over a
+    fixed background; the target face is also on screen for the target_window
+    fraction of the clip. Returns ground truth: frame count, fps, the target's
+    first/last frame and its box per frame.
+    """
+    rng = np.random.default_rng(seed)
+    crops = load_face_crops(faces_dir)
+    target = target_crop(crops)
+    distractors = [c for c in crops if c is not target] or crops
+    background = make_background(width, height, rng)
+    n_frames = int(seconds * fps)
+    first, last = int(n_frames * target_window[0]), int(n_frames * target_window[1]) - 1
+
+    def sprite(crop):
+        size = int(rng.integers(face_size_range[0], face_size_range[1] + 1))
+        size = min(size, min(width, height) - 2)
+        return {"image": cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA),
+                "pos": np.array([rng.uniform(0, width - size), rng.uniform(0, height - size)]),
+                "vel": rng.uniform(-2.0, 2.0, size=2) * fps / 15.0}
+
+    sprites = [sprite(distractors[int(rng.integers(0, len(distractors)))]) for _ in range(n_faces)]
+    target_sprite = sprite(target)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open a {fourcc} video writer for {path}")
+    target_boxes = {}
+    try:
+        for idx in range(n_frames):
+            frame = background.copy()
+            active = sprites + ([target_sprite] if first <= idx <= last else [])
+            for s in active:
+                size = s["image"].shape[0]
+                x, y = (int(v) for v in s["pos"])
+                frame[y:y+size, x:x+size] = s["image"]
+                if s is target_sprite:
+                    target_boxes[idx] = [x, y, size, size]
+                # Move, bouncing off the frame edges
+                s["pos"] += s["vel"]
+                for axis, limit in ((0, width - size), (1, height - size)):
+                    if not 0 <= s["pos"][axis] <= limit:
+                        s["vel"][axis] = -s["vel"][axis]
+                        s["pos"][axis] = min(max(s["pos"][axis], 0), limit)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return {"frames": n_frames, "fps": fps, "width": width, "height": height, "faces": n_faces,
+            "targetFirstFrame": first, "targetLastFrame": last, "targetBoxes": target_boxes}
@@ -0,0 +1,207 @@
+# bulk_enroll.py
+"""
+Bulk gallery enrollment from a zip archive or a directory of images.
+
+Face detection runs across a process pool (one detector per worker, built
+from the analyzer's detector config; workers are spawned, not forked, since
+the app calls this from a process that already runs threads holding locks),
+FaceNet embeddings are computed in batches in the parent process and all
+enrolled faces are written to the gallery store in one transaction.
+
+CLI usage (from backend/):
+    python bulk_enroll.py watchlist.zip --metadata watchlist.csv --db gallery.db
+"""
+import argparse
+import csv
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from detectors import create_detector
+from gallery_store import GalleryStore
+from logging_setup import configure_logging, fields
+from simple_face_analyzer import SimpleFaceAnalyzer, select_reference_face
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+# Per-process detector state, created by _init_worker
+_worker_detector = None
+_worker_min_face_size = None
+
+# -------------------------
+# Inputs
+# -------------------------
+def read_metadata(source):
+    """
+    Parse the metadata CSV (path or text file object).
+    Expected columns: filename, person_id, name; any other column is kept as metadata.
+    Returns dict filename -> row dict.
+    """
+    if source is None:
+        return {}
+    if isinstance(source, str):
+        with open(source, newline='', encoding='utf-8') as f:
+            return read_metadata(f)
+
+    rows = {}
+    for row in csv.DictReader(source):
+        filename = (row.get('filename') or '').strip()
+        if filename:
+            rows[os.path.basename(filename)] = row
+    return rows
+
+
+def iter_images(source):
+    """Yield (filename, bytes) for every image in a zip archive or directory"""
+    if isinstance(source, str) and os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if _is_image(name):
+                    with open(os.path.join(root, name), 'rb') as f:
+                        yield name, f.read()
+        return
+
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not _is_image(info.filename):
+                continue
+            # Skip macOS resource forks shipped inside zips
+            if '__MACOSX/' in info.filename or os.path.basename(info.filename).startswith('._'):
+                continue
+            yield os.path.basename(info.filename), archive.read(info)
+
+
+def _is_image(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+
+# -------------------------
+# Worker side (detection)
+# -------------------------
+def _init_worker(detector_config, min_face_size):
+    global _worker_detector, _worker_min_face_size
+    detector_config = dict(detector_config)
+    if 'tile_min_side' in detector_config:
+        # Tiling threads inside worker processes would only oversubscribe the CPU
+        detector_config['tile_min_side'] = None
+    _worker_detector = create_detector(**detector_config)
+    _worker_min_face_size = min_face_size
+
+
+def _detect_worker(item):
+    """Decode one image and return (filename, crop or None, message)"""
+    filename, data = item
+    try:
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return filename, None, "Could not read reference image"
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        crop, message = select_reference_face(gray, _worker_detector, _worker_min_face_size, image=img)
+        if crop is None:
+            return filename, None, message
+        return filename, crop.copy(), message
+    except Exception as e:
+        return filename, None, f"Error loading reference: {e}"
+
+
+# -------------------------
+# Enrollment
+# -------------------------
+def enroll(source, metadata, analyzer, store, workers=None, batch_size=32):
+    """
+    Enroll every image in source (zip path/file object or directory) into store.
+    metadata: dict filename -> row (see read_metadata); empty dict means the
+    file stem is used as person_id and name.
+    Returns a report dict with enrolled count and per-image failures.
+    """
+    failures = []
+    items = []
+    total_images = 0
+    for filename, data in iter_images(source):
+        total_images += 1
+        if metadata and filename not in metadata:
+            failures.append({"file": filename, "error": "No metadata row for image"})
+            continue
+        items.append((filename, data))
+
+    # Each spawned worker pays an interpreter start + detector build: never start more than there are images
+    workers = max(1, min(workers or os.cpu_count() or 1, len(items)))
+    logger.info("Bulk enrollment started", extra=fields(images=len(items), workers=workers))
+
+    crops = []
+    if items:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(analyzer.detector.config(), analyzer.min_face_size)) as pool:
+            for filename, crop, message in pool.map(_detect_worker, items, chunksize=4):
+                if crop is None:
+                    failures.append({"file": filename, "error": message})
+                else:
+                    crops.append((filename, crop))
+
+    entries = []
+    for filename, crop in crops:
+        features, _ = analyzer.extract_face_features(crop)
+        if features is None or np.isnan(features).any() or np.linalg.norm(features) < 1e-6:
+            failures.append({"file": filename, "error": "Could not extract valid features from reference"})
+            continue
+        row = metadata.get(filename) or {}
+        stem = os.path.splitext(filename)[0]
+        entries.append({
+            "person_id": (row.get('person_id') or stem).strip(),
+            "name": (row.get('name') or stem).strip(),
+            "metadata": {k: v for k, v in row.items() if k and k not in ('filename', 'person_id', 'name')},
+            "source": filename,
+            "face": crop,
+            "features": features,
+        })
+
+    embeddings = analyzer.extract_embeddings_batch([e["face"] for e in entries], batch_size=batch_size)
+    for entry, emb in zip(entries, embeddings):
+        entry["embedding"] = emb
+
+    enrolled = store.add_entries(entries) if entries else 0
+
+    logger.info("Bulk enrollment finished", extra=fields(enrolled=enrolled, failed=len(failures)))
+    return {
+        "success": True,
+        "totalImages": total_images,
+        "enrolled": enrolled,
+        "failed": failures,
+        "embeddings": sum(1 for e in entries if e["embedding"] is not None),
+        "gallerySize": store.count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-enroll a watchlist into the gallery store")
+    parser.add_argument("source", help="zip archive or directory of face images")
+    parser.add_argument("--metadata", help="CSV with filename, person_id, name columns")
+    parser.add_argument("--db", default="gallery.db", help="gallery database path")
+    parser.add_argument("--workers", type=int, default=None, help="detection processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=32, help="FaceNet inference batch size")
+    parser.add_argument("--min-face-size", type=int, default=90)
+    args = parser.parse_args(argv)
+    configure_logging(fmt="text")
+
+    analyzer = SimpleFaceAnalyzer(min_face_size=args.min_face_size, debug_save=False)
+    store = GalleryStore(args.db)
+    report = enroll(args.source, read_metadata(args.metadata), analyzer, store,
+                    workers=args.workers, batch_size=args.batch_size)
+
+    for failure in report["failed"]:
+        print(f"   ❌ {failure['file']}: {failure['error']}")
+    print(f"📊 Enrolled {report['enrolled']}/{report['totalImages']} | Gallery size: {report['gallerySize']}")
+    return 0 if not report["failed"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+# debug_store.py
+"""
+Packed per-job debug store: instead of two JPEG files per saved face, every
+analysis job appends its JPEG crops to one file (<job_id>.pack) and one JSON
+line per crop to an index (<job_id>.idx) holding kind, frame, confidence,
+box and the crop's offset/length in the pack. Both files are append-only,
+so writes are sequential, and a reader can page through entries and fetch
+a single crop with one seek.
+"""
+import json
+import os
+import re
+
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def pack_paths(directory, job_id):
+    """(pack, index) paths for job_id; rejects ids that could escape directory"""
+    if not JOB_ID_PATTERN.match(job_id or ''):
+        raise ValueError(f"Invalid debug job id: {job_id!r}")
+    base = os.path.join(directory, job_id)
+    return base + ".pack", base + ".idx"
+
+
+class PackAppender:
+    """Appends entries to one job's pack + index (used from a single writer thread)"""
+
+    def __init__(self, directory, job_id):
+        os.makedirs(directory, exist_ok=True)
+        pack_path, index_path = pack_paths(directory, job_id)
+        self._pack = open(pack_path, 'ab')
+        self._index = open(index_path, 'a', encoding='utf-8')
+        self._offset = self._pack.seek(0, os.SEEK_END)
+
+    def append(self, data, kind, frame, confidence, box):
+        entry = {"kind": kind, "frame": int(frame), "confidence": round(float(confidence), 2),
+                 "box": [int(v) for v in box], "offset": self._offset, "length": len(data)}
+        self._pack.write(data)
+        self._offset += len(data)
+        self._index.write(json.dumps(entry) + "\n")
+        return entry
+
+    def flush(self):
+        self._pack.flush()
+        self._index.flush()
+
+    def close(self):
+        self._pack.close()
+        self._index.close()
+
+
+class DebugPack:
+    """Read side of one job's packed debug store"""
+
+    def __init__(self, directory, job_id):
+        self.job_id = job_id
+        self.pack_path, self.index_path = pack_paths(directory, job_id)
+        if not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"No debug store for job {job_id}")
+
+    def entries(self, kind=None, offset=0, limit=50):
+        """
+        Page through index entries (optionally only one kind: "true" or
+        "rejected"). Returns (total_matching, entries); each entry carries its
+        id for read(). A partially written last line is ignored.
+        """
+        total = 0
+        page = []
+        with open(self.index_path, encoding='utf-8') as f:
+            for entry_id, line in enumerate(f):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if kind is not None and entry.get("kind") != kind:
+                    continue
+                if offset <= total < offset + limit:
+                    page.append({"id": entry_id, **entry})
+                total += 1
+        return total, page
+
+    def entry(self, entry_id):
+        with open(self.index_path, encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                if i == entry_id:
+                    return {"id": entry_id, **json.loads(line)}
+        raise KeyError(entry_id)
+
+    def read(self, entry_id):
+        """JPEG bytes of one entry"""
+        entry = self.entry(entry_id)
+        with open(self.pack_path, 'rb') as f:
+            f.seek(entry["offset"])
+            return f.read(entry["length"])
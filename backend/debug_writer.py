@@ -0,0 +1,190 @@
+# debug_writer.py
+"""
+Background writer for debug crops / frames, so JPEG encoding and disk I/O
+never stall the scoring loop. Writes go through a bounded queue: when it is
+full the oldest pending write is dropped, and writes beyond max_per_second
+are dropped up front. Dropped counts are kept per submitting thread so each
+analysis job can report its own; a write evicted from the queue is charged
+to the job that submitted it, not to the one whose write pushed it out.
+
+packed=True appends crops only to one packed store per job (see
+debug_store.py) instead of writing a crop + full-frame JPEG pair per face.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import cv2
+
+from debug_store import PackAppender
+
+logger = logging.getLogger(__name__)
+
+# Packs kept open by the writer thread (jobs normally close theirs in end_job)
+MAX_OPEN_PACKS = 16
+
+
+class DebugFrameWriter:
+    def __init__(self, directory="debug_frames", max_queue=64, max_per_second=10, jpeg_quality=85, packed=False):
+        self.directory = directory
+        self.max_queue = max_queue
+        self.max_per_second = max_per_second
+        self.jpeg_quality = jpeg_quality
+        self.packed = packed
+        os.makedirs(directory, exist_ok=True)
+        self._packs = OrderedDict()
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._busy = False
+        self._window_start = 0.0
+        self._window_count = 0
+        self._local = threading.local()
+        self._thread = threading.Thread(target=self._run, name="debug-writer", daemon=True)
+        self._thread.start()
+
+    def start_job(self, job_id):
+        """Send this thread's following writes to job_id's pack (packed mode)"""
+        self._local.job_id = job_id
+
+    def end_job(self):
+        """Close this thread's current pack once its queued writes are done; returns its job id"""
+        job_id = getattr(self._local, 'job_id', None)
+        self._local.job_id = None
+        if self._is_packed(job_id):
+            with self._cond:
+                self._queue.append(("close", job_id))
+                self._cond.notify()
+        return job_id
+
+    def submit(self, frame, face_box, kind, frame_idx, confidence):
+        """
+        Queue a debug write for one scored face (kind: "true" / "rejected").
+        frame is kept by reference, so the caller must not modify it
+        afterwards (decoded frames never are). Packed jobs only store the
+        crop, so for them only a copy of the crop is queued, not the frame.
+        Returns False when the write was dropped by the rate limit.
+        """
+        counts = self._counts()
+        job_id = getattr(self._local, 'job_id', None)
+        image = frame
+        if self._is_packed(job_id):
+            x, y, w, h = face_box
+            image = frame[y:y+h, x:x+w].copy()
+        item = ("write", job_id, image, face_box, kind, frame_idx, confidence, counts)
+        with self._cond:
+            now = time.time()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_count = now, 0
+            if self.max_per_second and self._window_count >= self.max_per_second:
+                counts["dropped"] += 1
+                return False
+            self._window_count += 1
+
+            if len(self._queue) >= self.max_queue:
+                evicted = self._drop_oldest_write()
+                if evicted is not None:
+                    evicted[-1]["dropped"] += 1
+            self._queue.append(item)
+            counts["queued"] += 1
+            self._cond.notify()
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every queued write is on disk (or timeout seconds pass)"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def pending(self):
+        """Writes (and pack closes) waiting in the queue"""
+        return len(self._queue)
+
+    def reset_stats(self):
+        self._local.counts = {"queued": 0, "dropped": 0}
+
+    def stats(self):
+        counts = self._counts()
+        return {"queued": counts["queued"], "dropped": counts["dropped"], "pending": len(self._queue)}
+
+    def _drop_oldest_write(self):
+        """Remove and return the oldest queued write (None if only closes are queued)"""
+        for i, item in enumerate(self._queue):
+            if item[0] == "write":
+                del self._queue[i]
+                return item
+        return None
+
+    def _counts(self):
+        counts = getattr(self._local, 'counts', None)
+        if counts is None:
+            self.reset_stats()
+            counts = self._local.counts
+        return counts
+
+    def _run(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)]
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    for pack in self._packs.values():
+                        pack.close()
+                    return
+                item = self._queue.popleft()
+                self._busy = True
+            try:
+                if item[0] == "close":
+                    pack = self._packs.pop(item[1], None)
+                    if pack is not None:
+                        pack.close()
+                else:
+                    # Last field is the submitter's counts, only needed while queued
+                    self._write(*item[1:-1], params)
+            except Exception as e:
+                logger.warning("Debug save error: %s", e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _is_packed(self, job_id):
+        return self.packed and job_id is not None
+
+    def _write(self, job_id, image, face_box, kind, frame_idx, confidence, params):
+        """image is the full frame, or for packed jobs the already cut-out crop (see submit)"""
+        if not self._is_packed(job_id):
+            x, y, w, h = face_box
+            frame, crop = image, image[y:y+h, x:x+w]
+            prefix = os.path.join(self.directory, f"{kind}_{frame_idx}_{int(confidence)}")
+            cv2.imwrite(f"{prefix}_crop.jpg", crop, params)
+            cv2.imwrite(f"{prefix}_frame.jpg", frame, params)
+            return
+
+        ok, jpeg = cv2.imencode(".jpg", image, params)
+        if not ok:
+            raise ValueError("Could not encode debug crop")
+        pack = self._packs.get(job_id)
+        if pack is None:
+            pack = self._packs[job_id] = PackAppender(self.directory, job_id)
+            while len(self._packs) > MAX_OPEN_PACKS:
+                self._packs.popitem(last=False)[1].close()
+        self._packs.move_to_end(job_id)
+        pack.append(jpeg.tobytes(), kind, frame_idx, confidence, face_box)
+        pack.flush()
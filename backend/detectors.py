@@ -0,0 +1,758 @@
+# detectors.py
+"""
+Face detectors used by SimpleFaceAnalyzer.
+Every detector exposes detect(image, scale_factor, min_neighbors, min_face_size)
+and returns an (N, 4) int32 array of [x, y, w, h] boxes in the coordinates
+of the image it was given. image may be grayscale or BGR; detectors with
+needs_color = True work best when given the BGR frame.
+
+Backends (see create_detector): haar, lbp, fast (LBP + Haar confirmation),
+multipose (frontal + profile Haar), dnn (OpenCV res10 SSD), mtcnn.
+"""
+import os
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+DEFAULT_CASCADE = 'haarcascade_frontalface_default.xml'
+PROFILE_CASCADE = 'haarcascade_profileface.xml'
+LBP_CASCADE = 'lbpcascade_frontalface_improved.xml'
+
+# res10 SSD face detector files (not shipped with opencv-python)
+DNN_MODEL_DIR = os.environ.get('DNN_MODEL_DIR', 'models')
+DNN_PROTOTXT = 'deploy.prototxt'
+DNN_CAFFEMODEL = 'res10_300x300_ssd_iter_140000.caffemodel'
+
+
+def find_cascade(filename):
+    """
+    Locate a cascade XML. opencv-python only ships haarcascades; LBP cascades
+    come from an OpenCV source/system install or CASCADE_DIR.
+    """
+    haar_dir = cv2.data.haarcascades
+    candidates = [
+        os.environ.get('CASCADE_DIR', ''),
+        haar_dir,
+        os.path.join(os.path.dirname(os.path.normpath(haar_dir)), 'lbpcascades'),
+        '/usr/share/opencv4/lbpcascades',
+        '/usr/local/share/opencv4/lbpcascades',
+        '/usr/share/opencv/lbpcascades',
+        'cascades',
+    ]
+    for directory in candidates:
+        if directory and os.path.isfile(os.path.join(directory, filename)):
+            return os.path.join(directory, filename)
+    raise ValueError(f"Cascade {filename} not found - set CASCADE_DIR to a directory containing it")
+
+
+def to_gray(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def to_bgr(image):
+    return image if image.ndim == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+# -------------------------
+# Box utilities
+# -------------------------
+def as_boxes(faces):
+    """detectMultiScale output (tuple or array) -> (N, 4) int32 array"""
+    return np.array(faces, dtype=np.int32).reshape(-1, 4)
+
+
+def non_max_suppression(boxes, iou_threshold=0.3):
+    """
+    Greedy NMS for score-less boxes: larger boxes win, any box overlapping a
+    kept box by more than iou_threshold (or lying mostly inside it) is dropped.
+    """
+    boxes = as_boxes(boxes)
+    if len(boxes) <= 1:
+        return boxes
+
+    x0, y0 = boxes[:, 0].astype(np.float64), boxes[:, 1].astype(np.float64)
+    x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+    areas = boxes[:, 2].astype(np.float64) * boxes[:, 3]
+    order = np.argsort(-areas)
+
+    keep = []
+    while len(order):
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        ix = np.maximum(0, np.minimum(x1[i], x1[rest]) - np.maximum(x0[i], x0[rest]))
+        iy = np.maximum(0, np.minimum(y1[i], y1[rest]) - np.maximum(y0[i], y0[rest]))
+        inter = ix * iy
+        iou = inter / (areas[i] + areas[rest] - inter)
+        contained = inter / np.maximum(areas[rest], 1e-9)
+        order = rest[(iou <= iou_threshold) & (contained <= 0.8)]
+    return boxes[keep]
+
+
+def overlaps_any(box, boxes, iou_threshold=0.3):
+    """True if box overlaps any of boxes as non_max_suppression would suppress it"""
+    boxes = as_boxes(boxes)
+    if not len(boxes):
+        return False
+    x, y, w, h = (float(v) for v in box)
+    ix = np.maximum(0, np.minimum(x + w, boxes[:, 0] + boxes[:, 2]) - np.maximum(x, boxes[:, 0]))
+    iy = np.maximum(0, np.minimum(y + h, boxes[:, 1] + boxes[:, 3]) - np.maximum(y, boxes[:, 1]))
+    inter = ix * iy
+    areas = boxes[:, 2].astype(np.float64) * boxes[:, 3]
+    iou = inter / (w * h + areas - inter)
+    contained = inter / np.maximum(np.minimum(w * h, areas), 1e-9)
+    return bool(((iou > iou_threshold) | (contained > 0.8)).any())
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """
+    Overlapping tiles (x0, y0, x1, y1) covering a width x height image.
+    Any object no larger than overlap lies entirely inside at least one tile.
+    """
+    step = max(1, tile_size - overlap)
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x, y, min(width, x + tile_size), min(height, y + tile_size))
+            for y in starts(height) for x in starts(width)]
+
+
+# -------------------------
+# Detection-resolution policy
+# -------------------------
+def detection_scale(min_face_size, detection_min_face_px):
+    """
+    Detection-resolution policy: the factor (<= 1) to shrink a frame by so
+    that the smallest face we accept (min_face_size) is still detection_min_face_px
+    tall. Pyramid levels below that size would only find faces we reject anyway.
+    """
+    if not detection_min_face_px or min_face_size <= detection_min_face_px:
+        return 1.0
+    return detection_min_face_px / float(min_face_size)
+
+
+def downscale(gray, scale):
+    """Resize gray by scale (no-op at 1.0)"""
+    if scale >= 1.0:
+        return gray
+    height, width = gray.shape[:2]
+    return cv2.resize(gray, (max(1, int(round(width * scale))), max(1, int(round(height * scale)))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def upscale_boxes(faces, scale, shape):
+    """Map boxes detected on a frame shrunk by scale back to full resolution, clipped to shape"""
+    faces = as_boxes(faces)
+    if scale >= 1.0 or not len(faces):
+        return faces
+    faces = np.round(faces / scale).astype(np.int32)
+    height, width = shape[:2]
+    faces[:, 2] = np.minimum(faces[:, 2], width - faces[:, 0])
+    faces[:, 3] = np.minimum(faces[:, 3], height - faces[:, 1])
+    return faces
+
+
+# -------------------------
+# Per-thread cascade pool
+# -------------------------
+_xml_cache = {}
+_xml_cache_lock = threading.Lock()
+
+
+def cached_cascade_xml(cascade_path):
+    """Cascade XML text, read from disk once per process"""
+    with _xml_cache_lock:
+        xml = _xml_cache.get(cascade_path)
+        if xml is None:
+            with open(cascade_path, 'r') as f:
+                xml = f.read()
+            _xml_cache[cascade_path] = xml
+        return xml
+
+
+_HAAR_RECT = re.compile(r'<_>(\s*)(\d+) (\d+) (\d+) (\d+) (\S+?)</_>')
+
+
+def mirror_cascade_xml(xml):
+    """
+    Haar cascade XML (new format) that detects the left-right mirror image of
+    what xml detects: every feature rectangle is reflected inside the window.
+    Tilted features cannot be reflected this way and are rejected.
+    """
+    width = re.search(r'<width>\s*(\d+)\s*</width>', xml)
+    head, sep, features = xml.partition('<features>')
+    if not sep or width is None or '<featureType>HAAR</featureType>' not in head:
+        raise ValueError("Only new-format Haar cascades can be mirrored")
+    if re.search(r'<tilted>\s*1\s*</tilted>', features):
+        raise ValueError("Cascades with tilted features cannot be mirrored")
+    window = int(width.group(1))
+
+    def reflect(m):
+        space, x, y, w, h, weight = m.groups()
+        return f"<_>{space}{window - int(x) - int(w)} {y} {w} {h} {weight}</_>"
+
+    return head + sep + _HAAR_RECT.sub(reflect, features)
+
+
+class CascadePool:
+    """
+    Checkout/return pool of cv2.CascadeClassifier instances. OpenCV cascade
+    objects are not safe for concurrent detectMultiScale calls, so each
+    caller checks one out for the duration of a detection and returns it.
+    Instances are parsed from the shared in-memory XML and created lazily,
+    up to max_size (default: as many as a default ThreadPoolExecutor has
+    workers); past that, callers wait for a free one. Instances outlive the
+    threads that used them, which matters under a thread-per-request server.
+    """
+
+    def __init__(self, cascade_path, mirrored=False, max_size=None):
+        self.cascade_path = cascade_path
+        self.mirrored = mirrored
+        self.max_size = max_size or min(32, (os.cpu_count() or 1) + 4)
+        self._xml = cached_cascade_xml(cascade_path)
+        if mirrored:
+            self._xml = mirror_cascade_xml(self._xml)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.instances = 0
+
+    @contextmanager
+    def checkout(self):
+        """with pool.checkout() as cascade: ... (the instance is the caller's until the block ends)"""
+        cascade = self._acquire()
+        try:
+            yield cascade
+        finally:
+            self._idle.put(cascade)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self.instances < self.max_size
+            if grow:
+                self.instances += 1
+        if grow:
+            return self.build()
+        return self._idle.get()
+
+    def build(self):
+        """New classifier, owned by the caller (not part of the pool)"""
+        cascade = cv2.CascadeClassifier()
+        storage = cv2.FileStorage(self._xml, cv2.FILE_STORAGE_READ | cv2.FILE_STORAGE_MEMORY)
+        try:
+            loaded = cascade.read(storage.getFirstTopLevelNode())
+        finally:
+            storage.release()
+        if not loaded or cascade.empty():
+            # Old-format (pre-2.4) cascades can only be loaded from a file path
+            cascade = cv2.CascadeClassifier(self.cascade_path)
+        return cascade
+
+
+# -------------------------
+# Cascade detector
+# -------------------------
+class CascadeDetector:
+    """
+    Haar/LBP cascade detector with the detection-resolution policy and
+    optional tiled detection for very large frames. Safe to share between
+    threads: each thread detects with its own classifier from a CascadePool.
+
+    Tiling: frames whose longer side (after the resolution policy) is at
+    least tile_min_side are split into tile_size tiles overlapping by
+    tile_overlap. Tiles are scanned concurrently, each worker thread with its
+    own CascadeClassifier, for faces up to the overlap size; larger faces come
+    from one extra pass over a downscaled copy of the whole frame (cheap, since
+    those faces are big). Boxes are merged with NMS.
+    """
+
+    needs_color = False
+
+    def __init__(self, cascade_path=None, detection_min_face_px=None,
+                 tile_min_side=None, tile_size=1024, tile_overlap=256, tile_workers=None, name="haar"):
+        self.name = name
+        if cascade_path is None:
+            cascade_path = cv2.data.haarcascades + DEFAULT_CASCADE
+        self.cascade_path = cascade_path
+        self.detection_min_face_px = detection_min_face_px
+        self.tile_min_side = tile_min_side
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_workers = tile_workers
+
+        self.pool = CascadePool(cascade_path)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        with self.pool.checkout() as cascade:
+            loaded = not cascade.empty()
+        if not loaded:
+            raise ValueError(f"Could not load cascade: {cascade_path}")
+
+    def config(self):
+        """Constructor kwargs, to rebuild an equivalent detector in another process"""
+        return {
+            "backend": self.name,
+            "cascade_path": self.cascade_path,
+            "detection_min_face_px": self.detection_min_face_px,
+            "tile_min_side": self.tile_min_side,
+            "tile_size": self.tile_size,
+            "tile_overlap": self.tile_overlap,
+            "tile_workers": self.tile_workers,
+        }
+
+    def cascade(self):
+        """New CascadeClassifier owned by the caller, for one-off use outside detect()"""
+        return self.pool.build()
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.tile_workers,
+                                                    thread_name_prefix="tile-detect")
+            return self._executor
+
+    def detect(self, image, scale_factor=1.25, min_neighbors=6, min_face_size=90):
+        gray = to_gray(image)
+        scale = detection_scale(min_face_size, self.detection_min_face_px)
+        small = downscale(gray, scale)
+        min_size = max(1, int(round(min_face_size * scale)))
+
+        if self.tile_min_side and max(small.shape[:2]) >= self.tile_min_side:
+            faces = self._detect_tiled(small, scale_factor, min_neighbors, min_size)
+        else:
+            with self.pool.checkout() as cascade:
+                faces = cascade.detectMultiScale(
+                    small,
+                    scaleFactor=scale_factor,
+                    minNeighbors=min_neighbors,
+                    minSize=(min_size, min_size),
+                    flags=cv2.CASCADE_SCALE_IMAGE
+                )
+        return upscale_boxes(faces, scale, gray.shape)
+
+    def _detect_tiled(self, gray, scale_factor, min_neighbors, min_size):
+        height, width = gray.shape[:2]
+        overlap = min(self.tile_overlap, self.tile_size // 2)
+        tiles = tile_grid(width, height, self.tile_size, overlap)
+
+        def detect_tile(tile):
+            x0, y0, x1, y1 = tile
+            with self.pool.checkout() as cascade:
+                faces = as_boxes(cascade.detectMultiScale(
+                    gray[y0:y1, x0:x1],
+                    scaleFactor=scale_factor,
+                    minNeighbors=min_neighbors,
+                    minSize=(min_size, min_size),
+                    maxSize=(overlap, overlap),
+                    flags=cv2.CASCADE_SCALE_IMAGE
+                ))
+            faces[:, 0] += x0
+            faces[:, 1] += y0
+            return faces
+
+        def detect_large():
+            # Faces bigger than the overlap may straddle tiles: find them on a
+            # copy shrunk so the overlap size maps to a small window
+            scale = min(1.0, 48.0 / overlap)
+            small = downscale(gray, scale)
+            large_min = max(1, int(round(overlap * scale)))
+            with self.pool.checkout() as cascade:
+                faces = cascade.detectMultiScale(
+                    small,
+                    scaleFactor=scale_factor,
+                    minNeighbors=min_neighbors,
+                    minSize=(large_min, large_min),
+                    flags=cv2.CASCADE_SCALE_IMAGE
+                )
+            return upscale_boxes(faces, scale, gray.shape)
+
+        pool = self._pool()
+        futures = [pool.submit(detect_tile, tile) for tile in tiles]
+        futures.append(pool.submit(detect_large))
+        boxes = [f.result() for f in futures]
+        return non_max_suppression(np.concatenate(boxes))
+
+
+# -------------------------
+# Per-job stage counts
+# -------------------------
+class StageCounter:
+    """
+    Per-thread stage counters for multi-stage detectors, reported in analysis
+    summaries (see reset_stage_counts / stage_counts). Subclasses list their
+    stage names in STAGES and call _count(stage, n).
+    """
+
+    STAGES = ()
+
+    def __init__(self):
+        self._stage_local = threading.local()
+
+    def reset_stage_counts(self):
+        self._stage_local.counts = dict.fromkeys(self.STAGES, 0)
+
+    def stage_counts(self):
+        counts = getattr(self._stage_local, 'counts', None)
+        return dict(counts) if counts is not None else dict.fromkeys(self.STAGES, 0)
+
+    def _count(self, key, n):
+        if getattr(self._stage_local, 'counts', None) is None:
+            self.reset_stage_counts()
+        self._stage_local.counts[key] += n
+
+
+# -------------------------
+# LBP fast mode (LBP proposes, Haar confirms)
+# -------------------------
+class TwoStageCascadeDetector(StageCounter):
+    """
+    Fast triage detector: the LBP cascade (several times cheaper than Haar)
+    scans the whole frame, and each candidate box is optionally confirmed by
+    the Haar cascade run on that small ROI only, at a narrow scale band.
+    Candidates Haar cannot find are dropped as likely false positives.
+    Per-thread stage counts (lbpCandidates / haarConfirmed) are kept for the
+    analysis summary, see StageCounter.
+    """
+
+    STAGES = ("lbpCandidates", "haarConfirmed")
+    needs_color = False
+
+    def __init__(self, lbp_cascade_path=None, haar_cascade_path=None, confirm=True, roi_margin=0.25,
+                 detection_min_face_px=None, tile_min_side=None, name="fast"):
+        StageCounter.__init__(self)
+        self.name = name
+        if lbp_cascade_path is None:
+            lbp_cascade_path = find_cascade(LBP_CASCADE)
+        if haar_cascade_path is None:
+            haar_cascade_path = cv2.data.haarcascades + DEFAULT_CASCADE
+        self.proposer = CascadeDetector(lbp_cascade_path, detection_min_face_px=detection_min_face_px,
+                                        tile_min_side=tile_min_side, name="lbp")
+        self.confirmer = CascadePool(haar_cascade_path)
+        self.confirm = confirm
+        self.roi_margin = roi_margin
+
+    def config(self):
+        proposer = self.proposer.config()
+        return {
+            "backend": self.name,
+            "lbp_cascade_path": proposer["cascade_path"],
+            "haar_cascade_path": self.confirmer.cascade_path,
+            "confirm": self.confirm,
+            "roi_margin": self.roi_margin,
+            "detection_min_face_px": proposer["detection_min_face_px"],
+            "tile_min_side": proposer["tile_min_side"],
+        }
+
+    def cascade(self):
+        """New Haar (confirmer) CascadeClassifier owned by the caller"""
+        return self.confirmer.build()
+
+    def detect(self, image, scale_factor=1.25, min_neighbors=6, min_face_size=90):
+        gray = to_gray(image)
+        candidates = self.proposer.detect(gray, scale_factor, min_neighbors, min_face_size)
+        self._count("lbpCandidates", len(candidates))
+        if not self.confirm or not len(candidates):
+            if not self.confirm:
+                self._count("haarConfirmed", len(candidates))
+            return candidates
+
+        height, width = gray.shape[:2]
+        confirmed = []
+        with self.confirmer.checkout() as haar:
+            for x, y, w, h in candidates:
+                margin = int(self.roi_margin * max(w, h))
+                x0, y0 = max(0, x - margin), max(0, y - margin)
+                x1, y1 = min(width, x + w + margin), min(height, y + h + margin)
+                lo, hi = max(1, int(0.7 * min(w, h))), int(1.4 * max(w, h))
+                faces = haar.detectMultiScale(
+                    gray[y0:y1, x0:x1],
+                    scaleFactor=1.1,
+                    minNeighbors=3,
+                    minSize=(lo, lo),
+                    maxSize=(hi, hi),
+                    flags=cv2.CASCADE_SCALE_IMAGE
+                )
+                if len(faces):
+                    # Haar only gates; the LBP box is kept so reference and probe
+                    # crops come from the same detector (the scorers are alignment-sensitive)
+                    confirmed.append([x, y, w, h])
+        self._count("haarConfirmed", len(confirmed))
+        return as_boxes(confirmed)
+
+
+# -------------------------
+# Multi-pose (frontal + profile)
+# -------------------------
+class MultiPoseDetector(StageCounter):
+    """
+    Frontal, profile and mirrored-profile Haar cascades (the profile cascade
+    only knows one side; the other is a copy of it with every feature
+    reflected, so no image is flipped). Each cascade runs its own plain
+    detectMultiScale over the frame, so this costs about three frontal-only
+    passes. What it adds is one merged result: profile faces are only added
+    where no frontal face was found, so frontal faces keep the boxes the
+    scorers are tuned on.
+    """
+
+    STAGES = ("frontal", "profile", "profileMirrored")
+    needs_color = False
+
+    def __init__(self, frontal_cascade_path=None, profile_cascade_path=None, name="multipose"):
+        StageCounter.__init__(self)
+        self.name = name
+        self.frontal = CascadePool(frontal_cascade_path or cv2.data.haarcascades + DEFAULT_CASCADE)
+        self.profile = CascadePool(profile_cascade_path or find_cascade(PROFILE_CASCADE))
+        self.profile_mirrored = CascadePool(self.profile.cascade_path, mirrored=True)
+
+    def config(self):
+        return {"backend": self.name, "frontal_cascade_path": self.frontal.cascade_path,
+                "profile_cascade_path": self.profile.cascade_path}
+
+    def cascade(self):
+        return self.frontal.build()
+
+    def detect(self, image, scale_factor=1.25, min_neighbors=6, min_face_size=90):
+        gray = to_gray(image)
+        faces = as_boxes([])
+        # Poses in priority order: profile boxes only add new faces
+        for key, pool in (("frontal", self.frontal), ("profile", self.profile),
+                          ("profileMirrored", self.profile_mirrored)):
+            with pool.checkout() as cascade:
+                found = cascade.detectMultiScale(
+                    gray,
+                    scaleFactor=scale_factor,
+                    minNeighbors=min_neighbors,
+                    minSize=(min_face_size, min_face_size),
+                    flags=cv2.CASCADE_SCALE_IMAGE
+                )
+            self._count(key, len(found))
+            new = [f for f in non_max_suppression(as_boxes(found)) if not overlaps_any(f, faces)]
+            if new:
+                faces = np.vstack([faces, as_boxes(new)])
+        return faces
+
+
+# -------------------------
+# OpenCV DNN (res10 SSD)
+# -------------------------
+class DnnSsdDetector:
+    """
+    OpenCV DNN res10 300x300 SSD face detector (Caffe). One cv2.dnn.Net per
+    thread, like CascadePool. scale_factor / min_neighbors are cascade
+    parameters and are ignored; boxes below min_face_size are dropped.
+    batch_size > 1 lets video scans stack sampled frames into one forward
+    pass (see detect_batch).
+    """
+
+    needs_color = True
+
+    def __init__(self, model_dir=None, confidence_threshold=0.5, input_size=300, batch_size=1, name="dnn"):
+        self.name = name
+        self.model_dir = model_dir or DNN_MODEL_DIR
+        self.prototxt = os.path.join(self.model_dir, DNN_PROTOTXT)
+        self.caffemodel = os.path.join(self.model_dir, DNN_CAFFEMODEL)
+        if not (os.path.isfile(self.prototxt) and os.path.isfile(self.caffemodel)):
+            raise ValueError(f"DNN face model not found in {self.model_dir} "
+                             f"(need {DNN_PROTOTXT} and {DNN_CAFFEMODEL})")
+        self.confidence_threshold = confidence_threshold
+        self.input_size = input_size
+        self.batch_size = max(1, int(batch_size))
+        self._local = threading.local()
+
+    def config(self):
+        return {"backend": self.name, "model_dir": self.model_dir,
+                "confidence_threshold": self.confidence_threshold, "input_size": self.input_size,
+                "batch_size": self.batch_size}
+
+    def net(self):
+        net = getattr(self._local, 'net', None)
+        if net is None:
+            net = cv2.dnn.readNetFromCaffe(self.prototxt, self.caffemodel)
+            self._local.net = net
+        return net
+
+    def detect(self, image, scale_factor=1.25, min_neighbors=6, min_face_size=90):
+        frame = to_bgr(image)
+        blob = cv2.dnn.blobFromImage(frame, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+        net = self.net()
+        net.setInput(blob)
+        return self._boxes(net.forward()[0, 0], frame.shape, min_face_size)
+
+    def detect_batch(self, images, scale_factor=1.25, min_neighbors=6, min_face_size=90):
+        """
+        Detect faces in several frames with one forward pass per batch_size
+        frames. Returns one (N, 4) box array per input image, in order.
+        """
+        frames = [to_bgr(image) for image in images]
+        results = []
+        net = self.net()
+        for start in range(0, len(frames), self.batch_size):
+            chunk = frames[start:start + self.batch_size]
+            blob = cv2.dnn.blobFromImages(chunk, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+            net.setInput(blob)
+            # DetectionOutput stacks every image's rows in (1, 1, N, 7);
+            # column 0 is the image index within the batch
+            detections = net.forward()[0, 0]
+            image_ids = detections[:, 0].astype(np.int32)
+            for i, frame in enumerate(chunk):
+                results.append(self._boxes(detections[image_ids == i], frame.shape, min_face_size))
+        return results
+
+    def _boxes(self, detections, shape, min_face_size):
+        """SSD output rows [_, _, conf, x0, y0, x1, y1] (relative) -> filtered pixel boxes"""
+        height, width = shape[:2]
+        boxes = []
+        for det in detections:
+            if det[2] < self.confidence_threshold:
+                continue
+            x0, y0 = int(max(0.0, det[3]) * width), int(max(0.0, det[4]) * height)
+            x1, y1 = int(min(1.0, det[5]) * width), int(min(1.0, det[6]) * height)
+            w, h = x1 - x0, y1 - y0
+            if w >= min_face_size and h >= min_face_size:
+                boxes.append([x0, y0, w, h])
+        return as_boxes(boxes)
+
+
+# -------------------------
+# MTCNN (facenet-pytorch)
+# -------------------------
+class MtcnnDetector:
+    """MTCNN from facenet-pytorch (optional dependency), CPU inference"""
+
+    needs_color = True
+
+    def __init__(self, probability_threshold=0.9, name="mtcnn"):
+        try:
+            from facenet_pytorch import MTCNN
+        except Exception as e:
+            raise ValueError(f"MTCNN detector needs facenet-pytorch: {e}")
+        self.name = name
+        self.probability_threshold = probability_threshold
+        self.mtcnn = MTCNN(keep_all=True, device='cpu')
+
+    def config(self):
+        return {"backend": self.name, "probability_threshold": self.probability_threshold}
+
+    def detect(self, image, scale_factor=1.25, min_neighbors=6, min_face_size=90):
+        rgb = cv2.cvtColor(to_bgr(image), cv2.COLOR_BGR2RGB)
+        boxes, probs = self.mtcnn.detect(rgb)
+        if boxes is None:
+            return as_boxes([])
+        height, width = rgb.shape[:2]
+        result = []
+        for (x0, y0, x1, y1), prob in zip(boxes, probs):
+            if prob is None or prob < self.probability_threshold:
+                continue
+            x0, y0 = max(0, int(x0)), max(0, int(y0))
+            x1, y1 = min(width, int(x1)), min(height, int(y1))
+            if x1 - x0 >= min_face_size and y1 - y0 >= min_face_size:
+                result.append([x0, y0, x1 - x0, y1 - y0])
+        return as_boxes(result)
+
+
+# -------------------------
+# ROI re-detection scheduler
+# -------------------------
+class RoiRedetector:
+    """
+    Per-scan detection scheduler wrapping any detector: a full-frame pass
+    every full_every calls, and in between only the previous boxes' expanded
+    ROIs are searched, at a narrow size band around each box. Faces entering
+    the frame are picked up at the next full pass, so detection can lag by up
+    to full_every - 1 samples, and ROI boxes can sit a few pixels off the
+    full-frame result for the same face. Stateful: use one instance per
+    video pass and call reset() whenever the scan jumps (e.g. a new window).
+    """
+
+    def __init__(self, detector, full_every=5, roi_margin=0.5, size_band=(0.7, 1.4)):
+        self.detector = detector
+        self.needs_color = detector.needs_color
+        self.full_every = max(1, int(full_every))
+        self.roi_margin = roi_margin
+        self.size_band = size_band
+        self.full_scans = 0
+        self.roi_scans = 0
+        self.reset()
+
+    def reset(self):
+        """Forget previous boxes; the next call is a full-frame pass"""
+        self._since_full = None
+        self._previous = as_boxes([])
+
+    def stats(self):
+        return {"fullEvery": self.full_every, "fullScans": self.full_scans, "roiScans": self.roi_scans}
+
+    def detect(self, image, scale_factor=1.25, min_neighbors=6, min_face_size=90):
+        if self._since_full is None or self._since_full + 1 >= self.full_every:
+            faces = self.detector.detect(image, scale_factor, min_neighbors, min_face_size)
+            self.full_scans += 1
+            self._since_full = 0
+        else:
+            faces = self._detect_rois(image, scale_factor, min_neighbors, min_face_size)
+            self.roi_scans += 1
+            self._since_full += 1
+        self._previous = faces
+        return faces
+
+    def _detect_rois(self, image, scale_factor, min_neighbors, min_face_size):
+        height, width = image.shape[:2]
+        lo_band, hi_band = self.size_band
+        found = []
+        for x, y, w, h in self._previous:
+            margin = int(self.roi_margin * max(w, h))
+            x0, y0 = max(0, x - margin), max(0, y - margin)
+            x1, y1 = min(width, x + w + margin), min(height, y + h + margin)
+            lo, hi = max(min_face_size, int(lo_band * min(w, h))), int(hi_band * max(w, h))
+            for fx, fy, fw, fh in self.detector.detect(image[y0:y1, x0:x1], scale_factor, min_neighbors, lo):
+                if fw <= hi and fh <= hi:
+                    found.append([x0 + fx, y0 + fy, fw, fh])
+        # ROIs of nearby faces overlap and may report the same face twice
+        return non_max_suppression(found)
+
+
+# -------------------------
+# Backend registry
+# -------------------------
+def _haar(**options):
+    return CascadeDetector(name="haar", **options)
+
+
+def _lbp(**options):
+    if options.get('cascade_path') is None:
+        options['cascade_path'] = find_cascade(LBP_CASCADE)
+    return CascadeDetector(name="lbp", **options)
+
+
+DETECTOR_BACKENDS = {
+    "haar": _haar,
+    "lbp": _lbp,
+    "fast": TwoStageCascadeDetector,
+    "multipose": MultiPoseDetector,
+    "dnn": DnnSsdDetector,
+    "mtcnn": MtcnnDetector,
+}
+
+
+def create_detector(backend="haar", **options):
+    """
+    Build a detector by backend name. Raises ValueError for unknown backends
+    or when the backend's model files / dependency are missing.
+    """
+    factory = DETECTOR_BACKENDS.get(backend)
+    if factory is None:
+        raise ValueError(f"Unknown detector backend: {backend} (choose from {', '.join(DETECTOR_BACKENDS)})")
+    return factory(**options)
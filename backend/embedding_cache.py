@@ -0,0 +1,99 @@
+# embedding_cache.py
+"""
+In-memory LRU cache of FaceNet embeddings for near-identical face crops
+(a person standing still yields almost the same crop frame after frame).
+Keyed by the perceptual hash of the normalized 160x160 crop; a hit must also
+pass a similarity guard on a small thumbnail, so hash collisions between
+different faces never return the wrong embedding.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from frame_hash import phash
+
+GUARD_SIDE = 32
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU of crop hash -> (guard thumbnail, unit embedding), bounded
+    to max_entries. Hit/miss counts and inference time saved are kept per
+    thread, so concurrent analysis jobs report their own numbers
+    (see reset_stats / stats).
+    """
+
+    def __init__(self, max_entries=512, guard_threshold=0.98):
+        self.max_entries = max_entries
+        self.guard_threshold = guard_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Running mean FaceNet time per crop, used to estimate time saved by hits
+        self._miss_seconds = 0.0
+        self._misses_timed = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(face_160):
+        """Cache key and guard thumbnail for a normalized 160x160 grayscale crop"""
+        guard = cv2.resize(face_160, (GUARD_SIDE, GUARD_SIDE), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+        guard -= guard.mean()
+        guard /= max(float(np.linalg.norm(guard)), 1e-6)
+        return phash(face_160), guard
+
+    def get(self, key, guard):
+        """Cached unit embedding for key if its guard thumbnail still matches, else None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and float(entry[0] @ guard) >= self.guard_threshold:
+                self._entries.move_to_end(key)
+                hit = entry[1]
+            else:
+                hit = None
+        counts = self._counts()
+        if hit is None:
+            counts["misses"] += 1
+        else:
+            counts["hits"] += 1
+        return hit
+
+    def put(self, key, guard, embedding, seconds=None):
+        """Store an embedding (kept read-only) computed in seconds of inference"""
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.flags.writeable = False
+        with self._lock:
+            self._entries[key] = (guard, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if seconds is not None:
+                self._misses_timed += 1
+                self._miss_seconds += (seconds - self._miss_seconds) / self._misses_timed
+        return embedding
+
+    def reset_stats(self):
+        self._local.counts = {"hits": 0, "misses": 0}
+
+    def stats(self):
+        counts = self._counts()
+        lookups = counts["hits"] + counts["misses"]
+        return {
+            "hits": counts["hits"],
+            "misses": counts["misses"],
+            "hitRate": round(counts["hits"] / lookups, 3) if lookups else 0.0,
+            "savedSeconds": round(counts["hits"] * self._miss_seconds, 3),
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+        }
+
+    def _counts(self):
+        counts = getattr(self._local, 'counts', None)
+        if counts is None:
+            self.reset_stats()
+            counts = self._local.counts
+        return counts
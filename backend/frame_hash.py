@@ -0,0 +1,59 @@
+# frame_hash.py
+"""
+Perceptual hashing for skipping near-identical work: DCT pHash of a small
+downscaled luma image, compared by Hamming distance. Cheap (one INTER_AREA
+resize + a 32x32 DCT) and insensitive to compression noise. It only sees
+changes that alter the frame's coarse structure: a face of normal size
+(under ~150px at 1080p, any size seen at 4K) flips few or no bits, so this
+detects frozen or paused feeds, not whether faces moved.
+"""
+import cv2
+import numpy as np
+
+
+def phash(gray, hash_size=8, highfreq_factor=4):
+    """
+    64-bit (hash_size**2) perceptual hash of a grayscale image as a Python int:
+    low-frequency DCT coefficients of a (hash_size * highfreq_factor)^2
+    thumbnail, thresholded at their median (DC term excluded).
+    """
+    side = hash_size * highfreq_factor
+    small = cv2.resize(gray, (side, side), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size].ravel()
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+class FrameDeduplicator:
+    """
+    Rolling near-duplicate check for sampled video frames. Each frame is
+    compared with the last frame that was actually processed (not the last
+    sampled one), so a slow drift over a long frozen stretch still triggers
+    processing once it adds up to more than threshold bits.
+    """
+
+    def __init__(self, threshold=2, hash_size=8):
+        self.threshold = threshold
+        self.hash_size = hash_size
+        self.reference = None
+        self.duplicates = 0
+        self.checked = 0
+
+    def is_duplicate(self, gray):
+        """True if gray is within threshold of the last processed frame; otherwise it becomes that frame"""
+        self.checked += 1
+        value = phash(gray, self.hash_size)
+        if self.reference is not None and hamming(value, self.reference) <= self.threshold:
+            self.duplicates += 1
+            return True
+        self.reference = value
+        return False
+
+    def stats(self):
+        return {"hammingThreshold": self.threshold, "framesChecked": self.checked,
+                "duplicatesSkipped": self.duplicates}
@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+
+class GalleryStore:
+    """
+    SQLite-backed watchlist gallery.
+    Each row holds one enrolled face: identity metadata, the grayscale
+    reference crop (PNG), its classical feature vector and, when FaceNet is
+    available, its unit-norm embedding.
+    """
+
+    def __init__(self, db_path="gallery.db"):
+        self.db_path = db_path
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS gallery (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        person_id TEXT NOT NULL,
+                        name TEXT,
+                        metadata TEXT,
+                        source TEXT,
+                        face BLOB NOT NULL,
+                        features BLOB NOT NULL,
+                        embedding BLOB,
+                        enrolled_at TEXT
+                    )
+                    """
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_gallery_person ON gallery(person_id)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def add_entries(self, entries):
+        """
+        Insert enrolled faces in a single transaction.
+        entries: iterable of dicts with person_id, name, metadata, source,
+        face (grayscale uint8 crop), features (float32) and embedding (or None).
+        Returns the number of rows written.
+        """
+        enrolled_at = datetime.utcnow().isoformat()
+        rows = []
+        for entry in entries:
+            ok, png = cv2.imencode(".png", entry["face"])
+            if not ok:
+                raise ValueError(f"Could not encode face crop for {entry.get('source')}")
+            embedding = entry.get("embedding")
+            rows.append((
+                str(entry["person_id"]),
+                entry.get("name"),
+                json.dumps(entry.get("metadata") or {}),
+                entry.get("source"),
+                png.tobytes(),
+                np.asarray(entry["features"], dtype=np.float32).tobytes(),
+                None if embedding is None else np.asarray(embedding, dtype=np.float32).tobytes(),
+                enrolled_at,
+            ))
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO gallery (person_id, name, metadata, source, face, features, embedding, enrolled_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        finally:
+            conn.close()
+        return len(rows)
+
+    def count(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM gallery").fetchone()[0]
+        finally:
+            conn.close()
+
+    def load_snapshot(self):
+        """Load the whole gallery into an in-memory GallerySnapshot"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT person_id, name, metadata, source, face, features, embedding FROM gallery ORDER BY id"
+            ).fetchall()
+        finally:
+            conn.close()
+        return GallerySnapshot(rows)
+
+
+class GallerySnapshot:
+    """
+    Immutable, preloaded view of the gallery used for identification.
+    Holds normalized matrices so a probe face is scored against every entry
+    with a few matrix-vector products instead of a Python loop.
+    """
+
+    def __init__(self, rows):
+        self.entries = []
+        standards = []
+        features = []
+        embeddings = []
+        for person_id, name, metadata, source, face_png, features_blob, embedding_blob in rows:
+            face = cv2.imdecode(np.frombuffer(face_png, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+            if face is None:
+                continue
+            self.entries.append({
+                "person_id": person_id,
+                "name": name,
+                "metadata": json.loads(metadata) if metadata else {},
+                "source": source,
+            })
+            standards.append(cv2.resize(face, (100, 100)))
+            features.append(np.frombuffer(features_blob, dtype=np.float32))
+            embeddings.append(None if embedding_blob is None else np.frombuffer(embedding_blob, dtype=np.float32))
+
+        # Grayscale 100x100 standards (SSIM) and their zero-mean/unit-norm
+        # flattening (template correlation == TM_CCOEFF_NORMED on equal sizes)
+        self.standards = standards
+        self.template_matrix = None
+        self.feature_matrix = None
+        self.embedding_matrix = None
+        self.has_embeddings = False
+        if not self.entries:
+            return
+
+        self.template_matrix = _normalize_rows(
+            np.stack([s.astype(np.float32).ravel() for s in standards]), center=True)
+        self.feature_matrix = _normalize_rows(np.stack(features))
+
+        # Embeddings only usable when every entry has one
+        self.has_embeddings = all(e is not None for e in embeddings)
+        if self.has_embeddings:
+            self.embedding_matrix = _normalize_rows(np.stack(embeddings))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def similarities(self, features, standard, embedding=None):
+        """
+        Returns (feature_cos, template_corr, embedding_cos) arrays over all
+        entries; embedding_cos is None when embeddings are unavailable.
+        """
+        feature_cos = self.feature_matrix @ _normalize_rows(features.astype(np.float32)[None, :])[0]
+        probe = _normalize_rows(standard.astype(np.float32).ravel()[None, :], center=True)[0]
+        template_corr = self.template_matrix @ probe
+
+        embedding_cos = None
+        if embedding is not None and self.has_embeddings:
+            embedding_cos = self.embedding_matrix @ _normalize_rows(embedding.astype(np.float32)[None, :])[0]
+        return feature_cos, template_corr, embedding_cos
+
+
+def _normalize_rows(matrix, center=False):
+    if center:
+        matrix = matrix - matrix.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-8)
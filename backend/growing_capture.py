@@ -0,0 +1,141 @@
+# growing_capture.py
+"""
+cv2.VideoCapture look-alike over a video file that is still being uploaded,
+so analysis can start on the received prefix instead of waiting for the
+whole transfer. Works for containers whose frames can be decoded from a
+prefix (fragmented MP4, MKV, AVI); a file that cannot be opened until it is
+complete (MP4 with its index at the end) simply starts once the upload
+finishes.
+
+When decoding reaches the current end of the file the capture waits for
+more data, reopens the file and continues from the next undelivered frame.
+The last frame decoded before the end of a partial file may be truncated,
+so each frame is only returned once the frame after it has decoded (or the
+file is complete).
+"""
+import time
+
+import cv2
+
+
+class GrowingVideoCapture:
+    """
+    source: an uploads.UploadWatch (path, size, complete, wait(size, timeout)).
+    reopen_bytes: how much new data to wait for before reopening a partial
+    file; stall_timeout: seconds without new data before read() gives up.
+    """
+
+    def __init__(self, source, reopen_bytes=4 * 1024 * 1024, stall_timeout=300.0):
+        self.source = source
+        self.reopen_bytes = reopen_bytes
+        self.stall_timeout = stall_timeout
+        self._cap = None
+        self._opened_size = -1
+        self._opened_complete = False
+        self._position = 0
+        self._held = None
+        self._reopens = 0
+        self._waited = 0.0
+
+    def isOpened(self):
+        """Blocks until enough of the file has arrived to open it"""
+        if self._cap is None:
+            self._open_when_ready()
+        return self._cap is not None
+
+    def get(self, prop):
+        if not self.isOpened():
+            return 0.0
+        if prop == cv2.CAP_PROP_FRAME_COUNT and not self._opened_complete:
+            return 0.0  # unknown until the whole file is there
+        return self._cap.get(prop)
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        while True:
+            ok, frame = self._cap.read()
+            if ok:
+                if self._held is None:
+                    self._held = frame
+                    continue
+                out, self._held = self._held, frame
+                self._position += 1
+                return True, out
+            if self._opened_complete:
+                if self._held is None:
+                    return False, None
+                out, self._held = self._held, None
+                self._position += 1
+                return True, out
+            # End of the data received so far: drop the possibly truncated
+            # last frame and pick up again from it once more has arrived
+            self._held = None
+            self._reopen()
+
+    def release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def stats(self):
+        return {"reopens": self._reopens, "waitSeconds": round(self._waited, 3),
+                "startedBeforeUploadComplete": self._reopens > 0 or not self._opened_complete}
+
+    def _wait_for_data(self, min_size):
+        """Wait until the upload reaches min_size bytes or completes"""
+        start = time.time()
+        try:
+            while not self.source.complete and self.source.size < min_size:
+                if not self.source.wait(self.source.size, self.stall_timeout):
+                    raise TimeoutError(f"Upload stalled: no data for {self.stall_timeout:.0f}s "
+                                       f"at {self.source.size} bytes")
+        finally:
+            self._waited += time.time() - start
+
+    def _try_open(self):
+        complete = self.source.complete
+        size = self.source.size
+        cap = cv2.VideoCapture(self.source.path)
+        self._opened_size = size
+        if not cap.isOpened():
+            cap.release()
+            return None
+        self._opened_complete = complete
+        return cap
+
+    def _open_when_ready(self):
+        while True:
+            self._wait_for_data(self._opened_size + 1)
+            complete = self.source.complete
+            self._cap = self._try_open()
+            if self._cap is not None or complete:
+                return
+            self._wait_for_data(self._opened_size + self.reopen_bytes)
+
+    def _reopen(self):
+        self.release()
+        self._wait_for_data(self._opened_size + self.reopen_bytes)
+        self._reopens += 1
+        while True:
+            complete = self.source.complete
+            self._cap = self._try_open()
+            if self._cap is not None:
+                break
+            if complete:
+                raise IOError("Could not reopen the uploaded video")
+            self._wait_for_data(self._opened_size + self.reopen_bytes)
+        self._skip_to(self._position)
+
+    def _skip_to(self, frame_idx):
+        """Position the fresh capture on frame_idx (seek, else decode forward)"""
+        if frame_idx == 0:
+            return
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        if int(self._cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx:
+            return
+        self._cap.release()
+        self._cap = cv2.VideoCapture(self.source.path)
+        for _ in range(frame_idx):
+            if not self._cap.grab():
+                break
@@ -0,0 +1,120 @@
+# job_profiler.py
+"""
+On-demand profiling of a single analysis job. profile_job() runs the job
+under cProfile (optionally with tracemalloc) and stores the artifacts in
+<directory>/<profile_id>/:
+
+    cpu.prof     pstats dump (snakeviz, `python -m pstats`, ...)
+    cpu.txt      top functions by cumulative and by own time
+    memory.txt   tracemalloc: peak, and the top allocation sites at each
+                 checkpoint() the job passed (analysis start, pass
+                 boundaries, end) compared with the previous one
+
+cProfile only sees the job's own thread; work handed to background threads
+(debug writes, tiled detection) shows up as time spent waiting, if at all.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+
+PROFILE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+ARTIFACTS = ("cpu.prof", "cpu.txt", "memory.txt")
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 15
+
+_local = threading.local()
+
+
+def checkpoint(label):
+    """Mark a stage boundary; takes a tracemalloc snapshot if this thread's job is memory-profiled"""
+    snapshots = getattr(_local, 'snapshots', None)
+    if snapshots is not None:
+        snapshots.append((label, time.perf_counter(), tracemalloc.take_snapshot()))
+
+
+def profile_dir(directory, profile_id):
+    """Directory of one profile; rejects ids that could escape directory"""
+    if not PROFILE_ID_PATTERN.match(profile_id or ''):
+        raise ValueError(f"Invalid profile id: {profile_id!r}")
+    return os.path.join(directory, profile_id)
+
+
+def list_artifacts(directory, profile_id):
+    path = profile_dir(directory, profile_id)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"No profile {profile_id}")
+    return [name for name in ARTIFACTS if os.path.exists(os.path.join(path, name))]
+
+
+def profile_job(fn, directory, profile_id, memory=False):
+    """
+    Run fn() under cProfile (plus tracemalloc when memory=True) and write the
+    artifacts. Returns (fn's result, profiling summary dict).
+    """
+    path = profile_dir(directory, profile_id)
+    os.makedirs(path, exist_ok=True)
+
+    # tracemalloc is process-wide: only the first concurrent memory profile gets it
+    trace_memory = memory and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start(10)
+        _local.snapshots = []
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        result = fn()
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            checkpoint("end of job")
+            snapshots = _local.snapshots
+            _local.snapshots = None
+            tracemalloc.stop()
+
+    profiler.dump_stats(os.path.join(path, "cpu.prof"))
+    with open(os.path.join(path, "cpu.txt"), 'w', encoding='utf-8') as f:
+        f.write(_cpu_report(profiler))
+    if trace_memory:
+        with open(os.path.join(path, "memory.txt"), 'w', encoding='utf-8') as f:
+            f.write(_memory_report(snapshots, peak, start))
+
+    summary = {"profileId": profile_id, "seconds": round(elapsed, 3), "artifacts": list_artifacts(directory, profile_id)}
+    if memory and not trace_memory:
+        summary["note"] = "Memory profiling skipped: another job was already tracing allocations"
+    return result, summary
+
+
+def _cpu_report(profiler):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs()
+    out.write("== By cumulative time ==\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    out.write("\n== By own time ==\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(TOP_FUNCTIONS)
+    return out.getvalue()
+
+
+def _memory_report(snapshots, peak, start):
+    lines = [f"Peak traced memory: {peak / (1024 * 1024):.1f} MiB", ""]
+    previous = None
+    for label, when, snapshot in snapshots:
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        total = sum(stat.size for stat in snapshot.statistics('filename'))
+        lines.append(f"== {label} (+{when - start:.2f}s, {total / (1024 * 1024):.1f} MiB traced) ==")
+        if previous is None:
+            stats = snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+        else:
+            stats = snapshot.compare_to(previous, 'lineno')[:TOP_ALLOCATIONS]
+        lines.extend(str(stat) for stat in stats)
+        lines.append("")
+        previous = snapshot
+    return "\n".join(lines)
@@ -0,0 +1,94 @@
+# jobs.py
+"""
+Background analysis job queue with result caching. Jobs run on a small
+worker pool; a job whose cache key (content hash + reference + analysis
+options) was already analyzed completes immediately with the cached result.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from logging_setup import log_context
+from metrics import JOB_RESULT_CACHE
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    def __init__(self, workers=1, cache_entries=128, max_finished_jobs=1000):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+        self._jobs = OrderedDict()
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_entries = cache_entries
+        self.max_finished_jobs = max_finished_jobs
+
+    def submit(self, fn, cache_key=None, info=None):
+        """
+        Queue fn() (returns a result dict; a dict with "error" is not cached).
+        cache_key may be a callable when the key is only known once fn has
+        run (e.g. the content hash of a video still being uploaded); such jobs
+        always run, and their result is cached under the key it returns.
+        Returns the job's public state.
+        """
+        job_id = uuid.uuid4().hex
+        job = {"jobId": job_id, "status": "queued", "submittedAt": time.time(), "cached": False,
+               "info": info or {}}
+        with self._lock:
+            cached = self._results.get(cache_key) if cache_key is not None and not callable(cache_key) else None
+            if cached is not None:
+                self._results.move_to_end(cache_key)
+                job.update(status="done", cached=True, result=cached, finishedAt=job["submittedAt"])
+            self._jobs[job_id] = job
+            self._trim_jobs()
+        JOB_RESULT_CACHE.inc(result="miss" if cached is None else "hit")
+        if cached is None:
+            self._pool.submit(self._run, job, fn, cache_key)
+        return self._public(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else self._public(job)
+
+    def counts(self):
+        """Number of known jobs per status (queued, running, done, error)"""
+        counts = {"queued": 0, "running": 0, "done": 0, "error": 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        return counts
+
+    def _run(self, job, fn, cache_key):
+        job.update(status="running", startedAt=time.time())
+        with log_context(job=job["jobId"]):
+            try:
+                result = fn()
+            except Exception as e:
+                logger.exception("Analysis job failed")
+                result = {"error": f"Analysis job failed: {e}"}
+        if callable(cache_key):
+            cache_key = cache_key()
+        with self._lock:
+            job.update(status="error" if "error" in result else "done", result=result, finishedAt=time.time())
+            if cache_key is not None and "error" not in result:
+                self._results[cache_key] = result
+                self._results.move_to_end(cache_key)
+                while len(self._results) > self.cache_entries:
+                    self._results.popitem(last=False)
+
+    def _trim_jobs(self):
+        # Forget the oldest finished jobs beyond the budget
+        finished = [jid for jid, j in self._jobs.items() if j["status"] in ("done", "error")]
+        for jid in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[jid]
+
+    @staticmethod
+    def _public(job):
+        public = {k: v for k, v in job.items() if k != "result"}
+        if job["status"] in ("done", "error"):
+            public["result"] = job.get("result")
+        return public
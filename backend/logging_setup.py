@@ -0,0 +1,145 @@
+# logging_setup.py
+"""
+Structured logging for the backend. Modules log through the standard
+logging package (logging.getLogger(__name__)) with an event message and
+structured fields (extra=fields(...)); configure_logging() routes every
+record through a bounded in-memory queue to a background thread that does
+the formatting and stdout writes, so the analysis loop never blocks on I/O.
+When the queue is full new records are dropped (and counted) instead of
+waiting.
+
+Levels: INFO carries job-level events (analysis started / finished,
+reference loaded), DEBUG the per-frame ones (matches, rejects, progress),
+and per-face score lines are additionally sampled (see Sampler).
+
+log_context() / set_log_context() attach fields such as the analysis job id
+to every record logged from the current thread.
+"""
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from contextlib import contextmanager
+
+_context = contextvars.ContextVar('log_context', default={})
+_listener = None
+_handler = None
+
+
+def fields(**values):
+    """extra= argument carrying structured fields for one record"""
+    return {"fields": values}
+
+
+def set_log_context(**values):
+    """Add (or with None, remove) context fields for the current thread"""
+    context = {**_context.get(), **values}
+    _context.set({k: v for k, v in context.items() if v is not None})
+
+
+@contextmanager
+def log_context(**values):
+    """Context fields for the duration of a block"""
+    token = _context.set({**_context.get(), **{k: v for k, v in values.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class Sampler:
+    """Callable that is True once every `every` calls (thread-safe), for high-volume debug lines"""
+
+    def __init__(self, every=100):
+        self.every = max(1, int(every))
+        self._counter = itertools.count()
+
+    def __call__(self):
+        return next(self._counter) % self.every == 0
+
+
+class ContextFilter(logging.Filter):
+    """Copies the context fields onto the record (runs in the calling thread, before queueing)"""
+
+    def filter(self, record):
+        record.context = _context.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, 'context', None) or {})
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable: time level logger msg key=value ..."""
+
+    def format(self, record):
+        values = {**(getattr(record, 'context', None) or {}), **(getattr(record, 'fields', None) or {})}
+        line = (f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} "
+                f"{record.name}: {record.getMessage()}")
+        if values:
+            line += " " + " ".join(f"{k}={v}" for k, v in values.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of blocking or erroring"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level="INFO", fmt="json", queue_size=10000, stream=None):
+    """
+    Route the root logger through a non-blocking queue to one writer thread.
+    fmt: "json" (one object per line) or "text". Safe to call again to change
+    the level; the handler is only installed once.
+    """
+    global _listener, _handler
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if _listener is not None:
+        return root
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _handler.addFilter(ContextFilter())
+    root.handlers[:] = [_handler]
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
+
+
+def queue_stats():
+    """(records waiting to be written, records dropped so far) of the configured handler"""
+    if _handler is None:
+        return 0, 0
+    return _handler.queue.qsize(), _handler.dropped
@@ -1,41 +1,131 @@
 # simple_face_analyzer_fixed.py
 import cv2
 import numpy as np
+import copy
+import hashlib
+import logging
 import os
+import time
+import uuid
 from datetime import datetime
 
+from debug_writer import DebugFrameWriter
+from detectors import CascadeDetector, RoiRedetector
+from embedding_cache import EmbeddingCache
+from frame_hash import FrameDeduplicator
+from job_profiler import checkpoint
+from logging_setup import Sampler, fields, set_log_context
+from metrics import (EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE_LOOKUPS, FACES_DETECTED, FACES_SCORED,
+                     FRAMES_DECODED, STAGE_SECONDS)
+from stage_profiler import StageProfiler
+from video_scan import boxes_near, group_appearances, progressive_sample_order, windows_around
+
 # Optional import for SSIM
 try:
     from skimage.metrics import structural_similarity as ssim
 except Exception:
     ssim = None
 
+logger = logging.getLogger(__name__)
+
+# The cheap scorers (features 30 + template 25) top out at 55 points. On real
+# faces a crop's cheap score is about 0.79-0.87 of its full classical score,
+# so the coarse gate is the strict threshold scaled near the low end. With FaceNet
+# the strict score is the 0-100 embedding scale instead, which the cheap pass
+# never computes; its threshold is rescaled onto the cheap maximum
+CHEAP_SCORE_MAX = 55.0
+COARSE_THRESHOLD_RATIO = 0.81
+
+def default_coarse_threshold(confidence_threshold, facenet=False):
+    """Cheap-scorer gate equivalent to a strict confidence_threshold"""
+    if facenet:
+        return confidence_threshold / 100.0 * CHEAP_SCORE_MAX
+    return confidence_threshold * COARSE_THRESHOLD_RATIO
+
+def select_reference_face(gray, detector, min_face_size, image=None):
+    """
+    Detect and validate the reference face in a grayscale image.
+    detector: any detectors.py detector (e.g. CascadeDetector); image is the
+    BGR original, handed to detectors that need color.
+    Returns (crop, message); crop is None when the image is rejected.
+    """
+    # Strict detection parameters for reference
+    source = image if detector.needs_color and image is not None else gray
+    faces = detector.detect(source, scale_factor=1.2, min_neighbors=8, min_face_size=min_face_size)
+
+    if len(faces) == 0:
+        return None, "No clear face detected in reference image"
+
+    # Choose largest & most centered face
+    faces = sorted(faces, key=lambda r: (r[2]*r[3], -abs((r[0]+r[2]//2) - gray.shape[1]//2)), reverse=True)
+    x, y, w, h = faces[0]
+
+    # Validate size in image
+    if (w / float(gray.shape[1])) < 0.12:
+        return None, "Face in reference image is too small"
+
+    return gray[y:y+h, x:x+w], "Reference face found"
+
+
 class SimpleFaceAnalyzer:
     def __init__(self,
                  cascade_path=None,
                  confidence_threshold=85,
                  min_face_size=90,
-                 debug_save=True):
+                 debug_save=True,
+                 detection_min_face_px=None,
+                 tile_min_side=None,
+                 detector=None,
+                 redetect_every=None,
+                 dedup_hamming_threshold=None,
+                 embedding_cache_size=512,
+                 debug_writer=None,
+                 score_log_sample_every=100):
         # Reference storage
         self.reference_face = None          # grayscale crop of reference
         self.reference_standard = None      # resized standard (100x100)
         self.reference_features = None
         self.reference_embedding = None
 
-        # Detector
-        if cascade_path is None:
-            cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
+        # Detector. detection_min_face_px: None = detect on full-resolution frames,
+        # otherwise downscale so min_face_size maps to this many pixels (crops for
+        # scoring are always taken from the full-resolution frame).
+        # tile_min_side: frames at least this large are detected in parallel tiles.
+        # detector: any detectors.py backend (see create_detector); overrides the above.
+        if detector is None:
+            detector = CascadeDetector(cascade_path,
+                                       detection_min_face_px=detection_min_face_px,
+                                       tile_min_side=tile_min_side)
+        self.detector = detector
+        # redetect_every: in sequential video passes, run full-frame detection
+        # every N samples and only re-search around previous faces in between
+        # (None = full-frame detection on every sample; see RoiRedetector).
+        self.redetect_every = redetect_every
+        # dedup_hamming_threshold: in analyze_video, a sampled frame whose
+        # perceptual hash is within this many bits of the last processed frame
+        # reuses that frame's results (None = score every sampled frame). The
+        # hash is blind to small faces, so enable only for frozen/static feeds.
+        self.dedup_hamming_threshold = dedup_hamming_threshold
+        # embedding_cache_size: LRU budget (entries) of FaceNet embeddings reused
+        # for near-identical crops; 0/None disables the cache.
+        self.embedding_cache = EmbeddingCache(embedding_cache_size) if embedding_cache_size else None
+        # Per-stage timings of the current job (thread-local), reported as "profile"
+        self.profiler = StageProfiler(metric=STAGE_SECONDS)
 
         # Strictness params
         self.confidence_threshold = confidence_threshold
         self.min_face_size = min_face_size
         self.strict_mode = True
 
-        # Debugging
+        # Per-face score lines are logged at DEBUG for one in this many comparisons
+        self.score_log_sampler = Sampler(score_log_sample_every)
+
+        # Debugging. Crops/frames are written by a background DebugFrameWriter
+        # (bounded queue, drop-oldest, rate-limited); pass one to tune it.
         self.debug_save = debug_save
+        self.debug_writer = None
         if self.debug_save:
-            os.makedirs("debug_frames", exist_ok=True)
+            self.debug_writer = debug_writer or DebugFrameWriter("debug_frames")
 
         # Try to load facenet (optional) for embeddings
         self.use_facenet = False
@@ -50,13 +140,75 @@ class SimpleFaceAnalyzer:
             # Optionally use MTCNN for alignment if available
             self.mtcnn = MTCNN(keep_all=False)  # if you want aligned crops set to True earlier
             self.use_facenet = True
-            print("🧠 FaceNet + MTCNN available -> using embeddings & alignment")
+            logger.info("FaceNet + MTCNN available, using embeddings and alignment")
         except Exception:
             # facenet not available: continue with classical methods only
             self.mtcnn = None
             self.facenet = None
             self.torch = None
-            print("⚠️ FaceNet/MTCNN not available — using classical OpenCV/SSIM methods (recommended to install facenet-pytorch for best results)")
+            logger.warning("FaceNet/MTCNN not available, using classical OpenCV/SSIM methods "
+                           "(install facenet-pytorch for best results)")
+
+    @property
+    def face_cascade(self):
+        """
+        A new cascade classifier owned by the caller (kept for callers of the old
+        attribute); None for detector backends without one (dnn, mtcnn)
+        """
+        cascade = getattr(self.detector, 'cascade', None)
+        return cascade() if cascade is not None else None
+
+    def with_detector(self, detector):
+        """
+        Shallow copy of this analyzer using another detector backend, for
+        per-request detector selection. Reference and models are shared.
+        """
+        clone = copy.copy(self)
+        clone.detector = detector
+        return clone
+
+    def _reset_job_stats(self):
+        """
+        Start per-job counting: stage timings, detector stages (e.g. fast mode)
+        and embedding cache. The new analysis id tags this thread's log records
+        and names the job's packed debug store.
+        """
+        analysis_id = datetime.now().strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        set_log_context(analysis=analysis_id)
+        self.profiler.reset()
+        checkpoint("analysis start")
+        if hasattr(self.detector, 'reset_stage_counts'):
+            self.detector.reset_stage_counts()
+        if self.embedding_cache is not None:
+            self.embedding_cache.reset_stats()
+        if self.debug_writer is not None:
+            self.debug_writer.reset_stats()
+            # Packed debug stores are per job
+            self.debug_writer.start_job(analysis_id)
+
+    def _job_stats(self):
+        """Detector name, its per-stage candidate counts, embedding cache use and stage timings, for summaries"""
+        checkpoint("scan finished")
+        stats = {"detector": getattr(self.detector, 'name', type(self.detector).__name__)}
+        if hasattr(self.detector, 'stage_counts'):
+            stats["detectorStages"] = self.detector.stage_counts()
+        if self.embedding_cache is not None and self.use_facenet:
+            stats["embeddingCache"] = self.embedding_cache.stats()
+        if self.debug_writer is not None:
+            stats["debugWrites"] = self.debug_writer.stats()
+            job_id = self.debug_writer.end_job()
+            if self.debug_writer.packed:
+                stats["debugJob"] = job_id
+        stats["profile"] = self.profiler.summary()
+        return stats
+
+    def _debug_crops_note(self, debug_job):
+        """Where this job's saved debug crops can be found, for summary notes"""
+        if self.debug_writer is None:
+            return ""
+        if debug_job is not None:
+            return f" Saved crops: debugJob {debug_job} (GET /api/debug/{debug_job}/entries)."
+        return f" See {self.debug_writer.directory}/ for saved crops."
 
     # -------------------------
     # Utilities
@@ -72,15 +224,73 @@ class SimpleFaceAnalyzer:
         except:
             return "00:00:00"
 
-    def _debug_save_frame(self, frame, face_box, filename_prefix):
-        """Save debug crop + full frame for inspection"""
-        try:
-            x, y, w, h = face_box
-            crop = frame[y:y+h, x:x+w]
-            cv2.imwrite(f"debug_frames/{filename_prefix}_crop.jpg", crop)
-            cv2.imwrite(f"debug_frames/{filename_prefix}_frame.jpg", frame)
-        except Exception as e:
-            print("Debug save error:", e)
+    def _debug_save_frame(self, frame, face_box, kind, frame_idx, confidence):
+        """Queue a debug crop (+ full frame unless packed) for inspection, written in the background"""
+        if self.debug_writer is not None:
+            with self.profiler.stage("debugSave"):
+                self.debug_writer.submit(frame, face_box, kind, frame_idx, confidence)
+
+    # -------------------------
+    # Detection
+    # -------------------------
+    def detect_faces(self, gray, frame=None, detector=None):
+        """
+        Detect candidate faces in a grayscale video frame / probe image.
+        frame: BGR original, used by detectors that need color.
+        detector: per-pass override (e.g. a RoiRedetector), defaults to self.detector.
+        Boxes are in full-resolution coordinates whatever the detection resolution.
+        """
+        detector = detector or self.detector
+        source = frame if detector.needs_color and frame is not None else gray
+        with self.profiler.stage("detect"):
+            faces = detector.detect(source, scale_factor=1.25, min_neighbors=6, min_face_size=self.min_face_size)
+        FACES_DETECTED.inc(len(faces))
+        return faces
+
+    def _redetector(self):
+        """Fresh ROI re-detection scheduler for one sequential pass, or None when disabled"""
+        if not self.redetect_every or self.redetect_every <= 1:
+            return None
+        return RoiRedetector(self.detector, full_every=self.redetect_every)
+
+    def _frame_deduplicator(self):
+        """Fresh near-duplicate frame check for one sequential pass, or None when disabled"""
+        if self.dedup_hamming_threshold is None:
+            return None
+        return FrameDeduplicator(threshold=self.dedup_hamming_threshold)
+
+    def _reuse_match(self, match, frame_idx, fps):
+        """Copy of a match from the last processed frame, re-stamped for a duplicate frame"""
+        reused = dict(match, frame=frame_idx, time=self.format_timestamp(frame_idx / fps))
+        reused["duplicateOf"] = match["frame"]
+        return reused
+
+    def detect_faces_batch(self, grays, frames):
+        """
+        detect_faces over several frames; one forward pass per batch on
+        detectors that support it (DNN), a plain loop otherwise.
+        """
+        if getattr(self.detector, 'batch_size', 1) > 1 and hasattr(self.detector, 'detect_batch'):
+            sources = frames if self.detector.needs_color else grays
+            with self.profiler.stage("detectBatch"):
+                detections = self.detector.detect_batch(sources, scale_factor=1.25, min_neighbors=6,
+                                                        min_face_size=self.min_face_size)
+            FACES_DETECTED.inc(sum(len(faces) for faces in detections))
+            return detections
+        return [self.detect_faces(gray, frame) for gray, frame in zip(grays, frames)]
+
+    def crop_face(self, gray, box):
+        """
+        Crop a detected face with small padding to include the whole face.
+        Returns (crop, (x0, y0, x1, y1)).
+        """
+        x, y, w, h = box
+        pad = int(0.05 * (w + h) / 2)
+        x0 = max(0, x - pad)
+        y0 = max(0, y - pad)
+        x1 = min(gray.shape[1], x + w + pad)
+        y1 = min(gray.shape[0], y + h + pad)
+        return gray[y0:y1, x0:x1], (x0, y0, x1, y1)
 
     # -------------------------
     # Feature extraction
@@ -125,7 +335,7 @@ class SimpleFaceAnalyzer:
             features = np.concatenate([hist, [edge_density], lbp]).astype(np.float32)
             return features, standard_face
         except Exception as e:
-            print("Feature extraction error:", e)
+            logger.warning("Feature extraction error: %s", e)
             return None, None
 
     # -------------------------
@@ -139,31 +349,74 @@ class SimpleFaceAnalyzer:
         if not self.use_facenet or self.facenet is None:
             return None
 
+        # Near-identical crops (someone standing still) reuse their embedding
+        cache_key = None
+        if self.embedding_cache is not None:
+            cache_key = self.embedding_cache.key(cv2.resize(face_gray, (160, 160)))
+            cached = self.embedding_cache.get(*cache_key)
+            EMBEDDING_CACHE_LOOKUPS.inc(result="miss" if cached is None else "hit")
+            if cached is not None:
+                return cached
+
         try:
-            # If MTCNN is available and can align, we could use it; but here convert grayscale -> RGB
-            # Resize to 160x160 and convert to RGB
-            face_rgb = cv2.cvtColor(face_gray, cv2.COLOR_GRAY2BGR)
-            face_rgb = cv2.cvtColor(face_rgb, cv2.COLOR_BGR2RGB)
-            face_resized = cv2.resize(face_rgb, (160, 160)).astype(np.float32) / 255.0
-
-            # (C, H, W)
-            arr = np.transpose(face_resized, (2, 0, 1))
-            tensor = self.torch.tensor(arr).unsqueeze(0)  # shape (1,3,160,160)
-            # normalize to [-1,1] as facenet-pytorch expects
-            tensor = (tensor - 0.5) / 0.5
-
-            with self.torch.no_grad():
+            start = time.time()
+            tensor = self.torch.tensor(self._embedding_input(face_gray)).unsqueeze(0)  # shape (1,3,160,160)
+
+            with self.torch.no_grad(), self.profiler.stage("facenetInference"):
                 emb = self.facenet(tensor).cpu().numpy().flatten()
+            EMBEDDING_BATCH_SIZE.observe(1)
 
             # Normalize to unit vector
             norm = np.linalg.norm(emb)
             if norm > 1e-6:
                 emb = emb / norm
+            if cache_key is not None:
+                emb = self.embedding_cache.put(*cache_key, emb, seconds=time.time() - start)
             return emb
         except Exception as e:
-            print("Embedding extraction error:", e)
+            logger.warning("Embedding extraction error: %s", e)
             return None
 
+    def extract_embeddings_batch(self, faces_gray, batch_size=32):
+        """
+        Batched version of extract_embedding: one FaceNet forward pass per
+        batch_size crops. Returns a list aligned with faces_gray (None entries
+        when facenet is unavailable).
+        """
+        if not self.use_facenet or self.facenet is None:
+            return [None] * len(faces_gray)
+
+        embeddings = []
+        try:
+            for start in range(0, len(faces_gray), batch_size):
+                chunk = faces_gray[start:start + batch_size]
+                arr = np.stack([self._embedding_input(face) for face in chunk])
+                tensor = self.torch.tensor(arr)  # shape (B,3,160,160)
+
+                with self.torch.no_grad():
+                    embs = self.facenet(tensor).cpu().numpy()
+                EMBEDDING_BATCH_SIZE.observe(len(chunk))
+
+                norms = np.linalg.norm(embs, axis=1, keepdims=True)
+                embs = np.where(norms > 1e-6, embs / np.maximum(norms, 1e-6), embs)
+                embeddings.extend(embs)
+            return embeddings
+        except Exception as e:
+            logger.warning("Batch embedding extraction error: %s", e)
+            return [None] * len(faces_gray)
+
+    def _embedding_input(self, face_gray):
+        """Grayscale crop -> normalized (3,160,160) float32 array for FaceNet"""
+        # If MTCNN is available and can align, we could use it; but here convert grayscale -> RGB
+        # Resize to 160x160 and convert to RGB
+        face_rgb = cv2.cvtColor(face_gray, cv2.COLOR_GRAY2BGR)
+        face_rgb = cv2.cvtColor(face_rgb, cv2.COLOR_BGR2RGB)
+        face_resized = cv2.resize(face_rgb, (160, 160)).astype(np.float32) / 255.0
+
+        # (C, H, W), normalized to [-1,1] as facenet-pytorch expects
+        arr = np.transpose(face_resized, (2, 0, 1))
+        return (arr - 0.5) / 0.5
+
     # -------------------------
     # Load reference
     # -------------------------
@@ -172,37 +425,26 @@ class SimpleFaceAnalyzer:
         Load reference face image from disk.
         Returns: (True/False, message)
         """
-        try:
-            if not os.path.exists(image_path):
-                return False, "Reference image not found"
+        if not os.path.exists(image_path):
+            return False, "Reference image not found"
+        return self.load_reference_image(cv2.imread(image_path))
 
-            img = cv2.imread(image_path)
+    def load_reference_image(self, img):
+        """
+        Load the reference face from an already decoded BGR image (e.g. upload
+        bytes decoded in memory, see image_io.decode_image).
+        Returns: (True/False, message)
+        """
+        try:
             if img is None:
                 return False, "Could not read reference image"
 
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-            # Strict detection parameters for reference
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.2,
-                minNeighbors=8,
-                minSize=(self.min_face_size, self.min_face_size),
-                flags=cv2.CASCADE_SCALE_IMAGE
-            )
-
-            if len(faces) == 0:
-                return False, "No clear face detected in reference image"
+            ref_crop, message = select_reference_face(gray, self.detector, self.min_face_size, image=img)
+            if ref_crop is None:
+                return False, message
 
-            # Choose largest & most centered face
-            faces = sorted(faces, key=lambda r: (r[2]*r[3], -abs((r[0]+r[2]//2) - gray.shape[1]//2)), reverse=True)
-            x, y, w, h = faces[0]
-
-            # Validate size in image
-            if (w / float(gray.shape[1])) < 0.12:
-                return False, "Face in reference image is too small"
-
-            ref_crop = gray[y:y+h, x:x+w]
             self.reference_face = ref_crop.copy()
             self.reference_standard = cv2.resize(ref_crop, (100, 100))
 
@@ -219,11 +461,21 @@ class SimpleFaceAnalyzer:
                 if emb is not None:
                     self.reference_embedding = emb
 
-            print(f"✅ Reference face loaded: size={self.reference_face.shape}, embedding={'yes' if self.reference_embedding is not None else 'no'}")
+            logger.info("Reference face loaded", extra=fields(size=list(self.reference_face.shape),
+                                                              embedding=self.reference_embedding is not None,
+                                                              reference=self.reference_fingerprint()))
             return True, "Reference loaded"
         except Exception as e:
             return False, f"Error loading reference: {e}"
 
+    def reference_fingerprint(self):
+        """Short stable id of the loaded reference crop (None without one), e.g. for result caching"""
+        if self.reference_face is None:
+            return None
+        digest = hashlib.sha1(str(self.reference_face.shape).encode())
+        digest.update(self.reference_face.tobytes())
+        return digest.hexdigest()[:16]
+
     # -------------------------
     # Comparison
     # -------------------------
@@ -242,9 +494,35 @@ class SimpleFaceAnalyzer:
         except:
             return 0.0
 
-    def compare_faces_strict(self, current_face):
+    def _combine_scores(self, embedding_similarity, feature_similarity, template_similarity, structural_similarity):
+        """Combine the weighted per-method scores into a confidence percent"""
+        if embedding_similarity > 0:
+            # When embedding exists, favor it heavily
+            total_confidence = embedding_similarity * 0.85 + (template_similarity + structural_similarity) * 0.15
+        else:
+            total_confidence = feature_similarity + template_similarity + structural_similarity
+
+        # Penalize if template is very weak and no embedding
+        if template_similarity < 10.0 and embedding_similarity == 0:
+            total_confidence *= 0.85
+
+        # Additional rule-based checks to avoid sum of many weak signals becoming a match
+        # Require either decent template or structural evidence or embedding to consider high confidence
+        has_template_support = template_similarity >= 12.0
+        has_structural_support = structural_similarity >= 10.0
+        has_embedding_support = embedding_similarity >= 70.0  # embedding is strong indicator
+
+        # If no single support, penalize
+        if not (has_template_support or has_structural_support or has_embedding_support):
+            total_confidence *= 0.75
+
+        return min(100.0, float(total_confidence))
+
+    def compare_faces_strict(self, current_face, cheap=False):
         """
         Compares a current grayscale face crop against the loaded reference.
+        cheap=True skips SSIM and FaceNet (feature + template scorers only),
+        for coarse candidate search.
         Returns (confidence_percent, status_string)
         """
         try:
@@ -256,9 +534,11 @@ class SimpleFaceAnalyzer:
                 return 0, "Bad input face"
 
             # Extract features for candidate
-            current_features, current_standard = self.extract_face_features(current_face)
+            with self.profiler.stage("features"):
+                current_features, current_standard = self.extract_face_features(current_face)
             if current_features is None or np.isnan(current_features).any() or np.linalg.norm(current_features) < 1e-6:
                 return 0, "Bad features"
+            FACES_SCORED.inc()
 
             # Method A: feature vector cosine (weighted)
             feature_cos = self._cosine_similarity(self.reference_features, current_features)  # in [-1,1]
@@ -267,34 +547,37 @@ class SimpleFaceAnalyzer:
             # Method B: template matching
             template_similarity = 0.0
             try:
-                # Resize current to reference size to compare structure (use normalized coeff)
-                ref_h, ref_w = self.reference_face.shape[:2]
-                curr_resized = cv2.resize(current_face, (ref_w, ref_h))
-                # matchTemplate expects template (ref) and image (curr_resized)
-                res = cv2.matchTemplate(curr_resized, self.reference_face, cv2.TM_CCOEFF_NORMED)
-                # For equal sized images res is 1x1 but still use minMaxLoc
-                _, tscore, _, _ = cv2.minMaxLoc(res)
+                with self.profiler.stage("template"):
+                    # Resize current to reference size to compare structure (use normalized coeff)
+                    ref_h, ref_w = self.reference_face.shape[:2]
+                    curr_resized = cv2.resize(current_face, (ref_w, ref_h))
+                    # matchTemplate expects template (ref) and image (curr_resized)
+                    res = cv2.matchTemplate(curr_resized, self.reference_face, cv2.TM_CCOEFF_NORMED)
+                    # For equal sized images res is 1x1 but still use minMaxLoc
+                    _, tscore, _, _ = cv2.minMaxLoc(res)
                 template_similarity = max(0.0, float(tscore)) * 25.0
             except Exception:
                 template_similarity = 0.0
 
             # Method C: structural similarity (SSIM)
             structural_similarity = 0.0
-            if ssim is not None:
+            if ssim is not None and not cheap:
                 try:
-                    ref_ssim = cv2.resize(self.reference_standard, (100, 100))
-                    curr_ssim = cv2.resize(current_face, (100, 100))
-                    # ssim expects 2D arrays for grayscale
-                    s = ssim(ref_ssim, curr_ssim)
+                    with self.profiler.stage("ssim"):
+                        ref_ssim = cv2.resize(self.reference_standard, (100, 100))
+                        curr_ssim = cv2.resize(current_face, (100, 100))
+                        # ssim expects 2D arrays for grayscale
+                        s = ssim(ref_ssim, curr_ssim)
                     structural_similarity = max(0.0, float(s)) * 20.0
                 except Exception:
                     structural_similarity = 0.0
 
             # Method D: FaceNet embedding (if available)
             embedding_similarity = 0.0
-            if self.reference_embedding is not None and self.use_facenet:
+            if self.reference_embedding is not None and self.use_facenet and not cheap:
                 try:
-                    curr_emb = self.extract_embedding(current_face)
+                    with self.profiler.stage("facenet"):
+                        curr_emb = self.extract_embedding(current_face)
                     if curr_emb is not None:
                         cos_emb = self._cosine_similarity(self.reference_embedding, curr_emb)  # in [-1,1]
                         cos_emb = max(0.0, cos_emb)
@@ -302,58 +585,180 @@ class SimpleFaceAnalyzer:
                 except Exception:
                     embedding_similarity = 0.0
 
-            # Combine signals
-            if embedding_similarity > 0:
-                # When embedding exists, favor it heavily
-                total_confidence = embedding_similarity * 0.85 + (template_similarity + structural_similarity) * 0.15
-            else:
-                total_confidence = feature_similarity + template_similarity + structural_similarity
-
-            # Penalize if template is very weak and no embedding
-            if template_similarity < 10.0 and embedding_similarity == 0:
-                total_confidence *= 0.85
-
-            # Additional rule-based checks to avoid sum of many weak signals becoming a match
-            # Require either decent template or structural evidence or embedding to consider high confidence
-            has_template_support = template_similarity >= 12.0
-            has_structural_support = structural_similarity >= 10.0
-            has_embedding_support = embedding_similarity >= 70.0  # embedding is strong indicator
-
-            # If no single support, penalize
-            if not (has_template_support or has_structural_support or has_embedding_support):
-                total_confidence *= 0.75
-
-            total_confidence = min(100.0, float(total_confidence))
+            total_confidence = self._combine_scores(embedding_similarity, feature_similarity,
+                                                    template_similarity, structural_similarity)
 
             status = "STRICT_MATCH" if total_confidence >= self.confidence_threshold else "NO_MATCH"
 
-            # Debug print for each comparison
-            print(f"   Scores -> Embedding: {embedding_similarity:.1f}%, Features: {feature_similarity:.1f}%, Template: {template_similarity:.1f}%, Structural: {structural_similarity:.1f}% | Total: {total_confidence:.1f}% [{status}]")
+            # Sampled per-comparison scores (DEBUG only; one in score_log_sampler.every)
+            if logger.isEnabledFor(logging.DEBUG) and self.score_log_sampler():
+                logger.debug("Face scores", extra=fields(
+                    embedding=round(embedding_similarity, 1), features=round(feature_similarity, 1),
+                    template=round(template_similarity, 1), structural=round(structural_similarity, 1),
+                    total=round(total_confidence, 1), status=status))
 
             return total_confidence, status
 
         except Exception as e:
-            print("Comparison error:", e)
+            logger.warning("Comparison error: %s", e)
             return 0, "Error"
 
+    # -------------------------
+    # Gallery identification
+    # -------------------------
+    def score_against_gallery(self, face_gray, snapshot, top_k=5):
+        """
+        Score a grayscale face crop against every gallery entry.
+        A vectorized pass (embedding / feature cosine / template correlation)
+        ranks the whole gallery; SSIM is only computed for the top_k shortlist.
+        Returns list of candidate dicts sorted by confidence.
+        """
+        if snapshot is None or len(snapshot) == 0 or face_gray is None or face_gray.size == 0:
+            return []
+
+        features, standard = self.extract_face_features(face_gray)
+        if features is None or np.isnan(features).any() or np.linalg.norm(features) < 1e-6:
+            return []
+
+        embedding = self.extract_embedding(face_gray) if snapshot.has_embeddings else None
+        feature_cos, template_corr, embedding_cos = snapshot.similarities(features, standard, embedding)
+
+        feature_sim = np.maximum(0.0, feature_cos) * 30.0
+        template_sim = np.maximum(0.0, template_corr) * 25.0
+        embedding_sim = np.maximum(0.0, embedding_cos) * 100.0 if embedding_cos is not None else np.zeros(len(snapshot))
+
+        # Rank without SSIM first, then refine the shortlist with the full combination
+        coarse = np.where(embedding_sim > 0,
+                          embedding_sim * 0.85 + template_sim * 0.15,
+                          feature_sim + template_sim)
+        shortlist = np.argsort(-coarse)[:top_k]
+
+        candidates = []
+        for idx in shortlist:
+            structural_sim = 0.0
+            if ssim is not None:
+                try:
+                    structural_sim = max(0.0, float(ssim(snapshot.standards[idx], standard))) * 20.0
+                except Exception:
+                    structural_sim = 0.0
+            confidence = self._combine_scores(float(embedding_sim[idx]), float(feature_sim[idx]),
+                                              float(template_sim[idx]), structural_sim)
+            entry = snapshot.entries[idx]
+            candidates.append({
+                "personId": entry["person_id"],
+                "name": entry["name"],
+                "metadata": entry["metadata"],
+                "confidence": round(confidence, 2),
+                "match": confidence >= self.confidence_threshold,
+            })
+
+        candidates.sort(key=lambda c: c["confidence"], reverse=True)
+        return candidates
+
+    def identify_image(self, img, snapshot, top_k=5):
+        """
+        Detect every face in a BGR image and return top-k gallery candidates per face.
+        """
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        results = []
+        for box in self.detect_faces(gray, img):
+            face, (x0, y0, x1, y1) = self.crop_face(gray, box)
+            results.append({
+                "box": [int(x0), int(y0), int(x1-x0), int(y1-y0)],
+                "candidates": self.score_against_gallery(face, snapshot, top_k=top_k),
+            })
+        return results
+
+    def warm_up(self):
+        """Run one dummy embedding so the first real request does not pay model warm-up"""
+        if self.use_facenet:
+            self.extract_embedding(np.zeros((160, 160), dtype=np.uint8))
+
     # -------------------------
     # Video analyzer
     # -------------------------
-    def analyze_video(self, video_path, process_every_n_frames=15, save_matches=True):
+    def _scan_frame(self, frame, frame_idx, fps, save_matches=True, faces=None, gray=None, detector=None):
+        """
+        Detect and strictly score every face in one BGR frame.
+        faces / gray: detections and grayscale frame already computed by a
+        batched detection pass. detector: see detect_faces.
+        Returns (matches, faces_detected, rejected_count).
+        """
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if faces is None:
+            faces = self.detect_faces(gray, frame, detector)
+
+        matches = []
+        rejected = 0
+        for box in faces:
+            current_face, (x0, y0, x1, y1) = self.crop_face(gray, box)
+            confidence, status = self.compare_faces_strict(current_face)
+
+            timestamp_seconds = frame_idx / fps
+            timestamp = self.format_timestamp(timestamp_seconds)
+
+            if confidence >= self.confidence_threshold:
+                match_info = {
+                    "time": timestamp,
+                    "confidence": round(confidence, 2),
+                    "frame": frame_idx,
+                    "box": [int(x0), int(y0), int(x1-x0), int(y1-y0)],
+                    "status": "✅ HIGH CONFIDENCE MATCH"
+                }
+                matches.append(match_info)
+                logger.debug("True match", extra=fields(time=timestamp, frame=frame_idx, confidence=round(confidence, 1)))
+
+                # Save debug crops
+                if self.debug_save and save_matches:
+                    self._debug_save_frame(frame, (x0, y0, x1-x0, y1-y0), "true", frame_idx, confidence)
+            else:
+                rejected += 1
+                # Save borderline rejects for inspection
+                if self.debug_save and confidence > 40.0:
+                    self._debug_save_frame(frame, (x0, y0, x1-x0, y1-y0), "rejected", frame_idx, confidence)
+                if confidence > 50:
+                    logger.debug("Rejected", extra=fields(time=timestamp, frame=frame_idx,
+                                                          confidence=round(confidence, 1)))
+
+        return matches, len(faces), rejected
+
+    def _coarse_scan_frame(self, frame, coarse_threshold):
+        """
+        Cheap pass over one frame: detection + feature/template scorers only.
+        Returns (faces_detected, best_confidence).
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        faces = self.detect_faces(gray, frame)
+        best = 0.0
+        for box in faces:
+            current_face, _ = self.crop_face(gray, box)
+            confidence, _ = self.compare_faces_strict(current_face, cheap=True)
+            best = max(best, confidence)
+            if best >= coarse_threshold:
+                break
+        return len(faces), best
+
+    def analyze_video(self, video_path, process_every_n_frames=15, save_matches=True, refine=False, capture=None):
         """
         Analyze video and return dictionary result containing high-confidence matches only.
         process_every_n_frames: sample interval to speed up processing (default 15)
+        refine: locate exact first/last frames of each appearance (see refine_appearances)
+        capture: already created VideoCapture-like source to read instead of opening
+        video_path (e.g. a GrowingVideoCapture following an upload in progress);
+        refine still reopens video_path, so it must name the final file
         """
         try:
             if self.reference_face is None:
                 return {"error": "No reference face loaded"}
 
-            if not os.path.exists(video_path):
+            if capture is None and not os.path.exists(video_path):
                 return {"error": "Video file not found"}
 
-            cap = cv2.VideoCapture(video_path)
+            cap = capture if capture is not None else cv2.VideoCapture(video_path)
             if not cap.isOpened():
                 return {"error": "Could not open video"}
+            self._reset_job_stats()
 
             fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
@@ -363,71 +768,74 @@ class SimpleFaceAnalyzer:
             all_faces_detected = 0
             rejected_matches = 0
 
-            print(f"🎬 Starting video analysis: {os.path.basename(video_path)}")
-            print(f"📊 Video frames: {total_frames}, FPS: {fps:.2f}")
-            print(f"🎯 Confidence threshold (strict): {self.confidence_threshold}%")
-
+            logger.info("Video analysis started", extra=fields(
+                video=os.path.basename(video_path), frames=total_frames, fps=round(fps, 2),
+                threshold=self.confidence_threshold, detector=getattr(self.detector, 'name', None)))
+
+            # Sampled frames waiting for a batched detection pass (DNN batch_size > 1);
+            # ROI re-detection needs each frame's result before the next, so it
+            # only applies to unbatched detectors
+            batch_size = getattr(self.detector, 'batch_size', 1)
+            pending = []
+            redetector = self._redetector() if batch_size <= 1 else None
+            # Near-duplicate sampled frames reuse the last processed frame's results
+            dedup = self._frame_deduplicator()
+            last_result = None
+
+            def record(frame_idx, result, duplicate):
+                nonlocal all_faces_detected, rejected_matches, last_result
+                matches, faces_found, rejected = result
+                if duplicate:
+                    matches = [self._reuse_match(m, frame_idx, fps) for m in matches]
+                else:
+                    last_result = result
+                true_matches.extend(matches)
+                all_faces_detected += faces_found
+                rejected_matches += rejected
+
+            def flush():
+                to_detect = [(idx, f, g) for idx, f, g, duplicate in pending if not duplicate]
+                detections = iter(self.detect_faces_batch([g for _, _, g in to_detect], [f for _, f, _ in to_detect]))
+                for idx, f, g, duplicate in pending:
+                    if duplicate:
+                        record(idx, last_result, True)
+                    else:
+                        record(idx, self._scan_frame(f, idx, fps, save_matches, faces=next(detections), gray=g), False)
+                pending.clear()
+
+            profiler = self.profiler
             while True:
-                ret, frame = cap.read()
+                ret, frame = self._decode(cap)
                 if not ret:
                     break
 
                 if frame_count % process_every_n_frames == 0:
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-                    faces = self.face_cascade.detectMultiScale(
-                        gray,
-                        scaleFactor=1.25,
-                        minNeighbors=6,
-                        minSize=(self.min_face_size, self.min_face_size),
-                        flags=cv2.CASCADE_SCALE_IMAGE
-                    )
-
-                    all_faces_detected += len(faces)
-
-                    for (x, y, w, h) in faces:
-                        # Add small padding to the crop to include whole face
-                        pad = int(0.05 * (w + h) / 2)
-                        x0 = max(0, x - pad)
-                        y0 = max(0, y - pad)
-                        x1 = min(gray.shape[1], x + w + pad)
-                        y1 = min(gray.shape[0], y + h + pad)
-
-                        current_face = gray[y0:y1, x0:x1]
-                        confidence, status = self.compare_faces_strict(current_face)
-
-                        timestamp_seconds = frame_count / fps
-                        timestamp = self.format_timestamp(timestamp_seconds)
-
-                        if confidence >= self.confidence_threshold:
-                            match_info = {
-                                "time": timestamp,
-                                "confidence": round(confidence, 2),
-                                "frame": frame_count,
-                                "box": [int(x0), int(y0), int(x1-x0), int(y1-y0)],
-                                "status": "✅ HIGH CONFIDENCE MATCH"
-                            }
-                            true_matches.append(match_info)
-                            print(f"🎯 ✅ TRUE MATCH at {timestamp} - {confidence:.1f}%")
-
-                            # Save debug crops
-                            if self.debug_save and save_matches:
-                                self._debug_save_frame(frame, (x0, y0, x1-x0, y1-y0), f"true_{frame_count}_{int(confidence)}")
-                        else:
-                            rejected_matches += 1
-                            # Save borderline rejects for inspection
-                            if self.debug_save and confidence > 40.0:
-                                self._debug_save_frame(frame, (x0, y0, x1-x0, y1-y0), f"rejected_{frame_count}_{int(confidence)}")
-                            if confidence > 50:
-                                print(f"   ❌ REJECTED at {timestamp} - {confidence:.1f}% (need {self.confidence_threshold}%)")
+                    with profiler.stage("grayscale"):
+                        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    duplicate = False
+                    if dedup is not None:
+                        with profiler.stage("dedup"):
+                            duplicate = dedup.is_duplicate(gray)
+                    if batch_size > 1:
+                        pending.append((frame_count, frame, gray, duplicate))
+                        if len(pending) >= batch_size:
+                            flush()
+                    elif duplicate:
+                        record(frame_count, last_result, True)
+                    else:
+                        record(frame_count, self._scan_frame(frame, frame_count, fps, save_matches, gray=gray,
+                                                             detector=redetector), False)
 
                 frame_count += 1
 
                 # progress logs occasionally
                 if total_frames > 0 and frame_count % 200 == 0:
                     progress = (frame_count / total_frames) * 100.0
-                    print(f"📈 Progress: {progress:.1f}% | Frames processed: {frame_count}/{total_frames} | True matches: {len(true_matches)}")
+                    logger.debug("Progress", extra=fields(percent=round(progress, 1), frames=frame_count,
+                                                          totalFrames=total_frames, matches=len(true_matches)))
 
+            if pending:
+                flush()
             cap.release()
 
             summary = {
@@ -439,21 +847,447 @@ class SimpleFaceAnalyzer:
                 "rejectedDetections": rejected_matches,
                 "confidenceThreshold": self.confidence_threshold,
                 "method": "STRICT OpenCV + Multi-Method Validation (embedding if available)",
-                "note": "Only very high confidence matches are included in timestamps. See debug_frames/ for saved crops."
+                "note": "Only very high confidence matches are included in timestamps."
             }
+            summary.update(self._job_stats())
+            summary["note"] += self._debug_crops_note(summary.get("debugJob"))
+            if redetector is not None:
+                summary["redetection"] = redetector.stats()
+            if dedup is not None:
+                summary["deduplication"] = dedup.stats()
+            if hasattr(cap, 'stats'):
+                summary["streaming"] = cap.stats()
+            if refine:
+                summary["appearances"] = self.refine_appearances(video_path, true_matches, process_every_n_frames)
+
+            logger.info("Video analysis finished", extra=fields(
+                found=len(true_matches) > 0, framesProcessed=frame_count, facesDetected=all_faces_detected,
+                matches=len(true_matches), rejected=rejected_matches,
+                duplicatesReused=dedup.duplicates if dedup is not None else None))
 
-            print("\n📊 ANALYSIS SUMMARY:")
-            print(f"   Frames processed: {frame_count}")
-            print(f"   Faces detected: {all_faces_detected}")
-            print(f"   True matches: {len(true_matches)}")
-            print(f"   Rejected: {rejected_matches}")
-            print(f"   Final result: {'TARGET FOUND' if len(true_matches) > 0 else 'TARGET NOT FOUND'}")
+            return summary
+
+        except Exception as e:
+            return {"error": f"Video analysis error: {e}"}
+
+    def analyze_video_coarse_to_fine(self, video_path, coarse_interval_seconds=2.0, window_seconds=None,
+                                     coarse_threshold=None, dense_every_n_frames=1, save_matches=True):
+        """
+        Two-pass scan.
+        Pass 1 samples one frame every coarse_interval_seconds and scores faces with the
+        cheap scorers only; any face above coarse_threshold (default: the strict
+        threshold rescaled to the cheap scorers, see default_coarse_threshold)
+        marks a candidate window.
+        Pass 2 re-reads only those windows (+/- window_seconds, default one coarse
+        interval) every dense_every_n_frames frames with full strict scoring.
+        """
+        try:
+            if self.reference_face is None:
+                return {"error": "No reference face loaded"}
+
+            if not os.path.exists(video_path):
+                return {"error": "Video file not found"}
+
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                return {"error": "Could not open video"}
+            self._reset_job_stats()
+
+            start_time = time.time()
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            coarse_step = max(1, int(round(fps * coarse_interval_seconds)))
+            if window_seconds is None:
+                window_seconds = coarse_interval_seconds
+            window_radius = max(1, int(round(fps * window_seconds)))
+            if coarse_threshold is None:
+                coarse_threshold = default_coarse_threshold(self.confidence_threshold,
+                                                            facenet=self.reference_embedding is not None)
+            dense_every_n_frames = max(1, int(dense_every_n_frames))
+
+            logger.info("Coarse-to-fine analysis started", extra=fields(
+                video=os.path.basename(video_path), frames=total_frames, fps=round(fps, 2), coarseStep=coarse_step,
+                coarseThreshold=round(coarse_threshold, 1)))
+
+            # Pass 1: sparse, cheap scorers. grab() skips frames without retrieving them.
+            frame_count = 0
+            coarse_sampled = 0
+            coarse_faces = 0
+            candidate_frames = []
+            while True:
+                if frame_count % coarse_step == 0:
+                    ret, frame = self._decode(cap)
+                    if not ret:
+                        break
+                    coarse_sampled += 1
+                    faces_found, best = self._coarse_scan_frame(frame, coarse_threshold)
+                    coarse_faces += faces_found
+                    if best >= coarse_threshold:
+                        candidate_frames.append(frame_count)
+                        logger.debug("Coarse candidate", extra=fields(time=self.format_timestamp(frame_count / fps),
+                                                                      frame=frame_count, confidence=round(best, 1)))
+                elif not cap.grab():
+                    break
+                frame_count += 1
+
+            if total_frames <= 0:
+                total_frames = frame_count
+            windows = windows_around(candidate_frames, window_radius, total_frames)
+            coarse_time = time.time() - start_time
+            checkpoint("coarse pass finished")
+            logger.info("Coarse pass finished", extra=fields(sampled=coarse_sampled, windows=len(windows),
+                                                             seconds=round(coarse_time, 1)))
+
+            # Pass 2: dense, full scoring inside candidate windows only
+            true_matches = []
+            dense_processed = 0
+            dense_faces = 0
+            rejected_matches = 0
+            window_frames = 0
+            redetector = self._redetector()
+            for start, end in windows:
+                window_frames += end - start + 1
+                cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                if redetector is not None:
+                    redetector.reset()
+                for frame_idx in range(start, end + 1):
+                    if (frame_idx - start) % dense_every_n_frames == 0:
+                        ret, frame = self._decode(cap)
+                        if not ret:
+                            break
+                        matches, faces_found, rejected = self._scan_frame(frame, frame_idx, fps, save_matches,
+                                                                          detector=redetector)
+                        true_matches.extend(matches)
+                        dense_faces += faces_found
+                        rejected_matches += rejected
+                        dense_processed += 1
+                    elif not cap.grab():
+                        break
+
+            cap.release()
+
+            def coverage(frames):
+                return round(100.0 * frames / total_frames, 2) if total_frames > 0 else 0.0
+
+            summary = {
+                "matchFound": len(true_matches) > 0,
+                "timestamps": true_matches,
+                "totalFramesProcessed": coarse_sampled + dense_processed,
+                "totalFacesDetected": coarse_faces + dense_faces,
+                "targetDetections": len(true_matches),
+                "rejectedDetections": rejected_matches,
+                "confidenceThreshold": self.confidence_threshold,
+                "method": "Coarse-to-fine: cheap sparse pass + STRICT dense pass in candidate windows",
+                "passes": {
+                    "coarse": {
+                        "intervalSeconds": coarse_interval_seconds,
+                        "threshold": round(coarse_threshold, 2),
+                        "framesSampled": coarse_sampled,
+                        "candidateFrames": len(candidate_frames),
+                        "coveragePercent": coverage(coarse_sampled),
+                        "seconds": round(coarse_time, 2)
+                    },
+                    "dense": {
+                        "windows": [{"start": self.format_timestamp(a / fps), "end": self.format_timestamp(b / fps),
+                                     "startFrame": a, "endFrame": b} for a, b in windows],
+                        "everyNFrames": dense_every_n_frames,
+                        "framesProcessed": dense_processed,
+                        "coveragePercent": coverage(window_frames),
+                        "seconds": round(time.time() - start_time - coarse_time, 2)
+                    }
+                },
+                "totalFrames": total_frames,
+                "note": "Coverage is the share of the video's frames each pass looked at."
+            }
+            summary.update(self._job_stats())
+            if redetector is not None:
+                summary["passes"]["dense"]["redetection"] = redetector.stats()
+
+            logger.info("Coarse-to-fine analysis finished", extra=fields(
+                found=len(true_matches) > 0, coarseFrames=coarse_sampled,
+                coarseCoveragePercent=summary['passes']['coarse']['coveragePercent'],
+                denseFrames=dense_processed, windows=len(windows),
+                denseCoveragePercent=summary['passes']['dense']['coveragePercent'], matches=len(true_matches)))
 
             return summary
 
         except Exception as e:
             return {"error": f"Video analysis error: {e}"}
 
+    def _decode(self, cap):
+        """cap.read(), timed as the decode stage and counted in metrics"""
+        with self.profiler.stage("decode"):
+            ret, frame = cap.read()
+        if ret:
+            FRAMES_DECODED.inc()
+        return ret, frame
+
+    def _read_frame_at(self, cap, frame_idx, position, max_forward_grab=30):
+        """
+        Read frame_idx from cap whose next frame to decode is position.
+        Short forward gaps are grabbed through (cheaper than a keyframe seek),
+        anything else seeks. Returns (ret, frame, new_position, frames_decoded).
+        """
+        decoded = 0
+        gap = frame_idx - position
+        if 0 < gap <= max_forward_grab:
+            for _ in range(gap):
+                if not cap.grab():
+                    return False, None, position, decoded
+                position += 1
+                decoded += 1
+        elif gap != 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        ret, frame = self._decode(cap)
+        return ret, frame, frame_idx + 1, decoded + 1
+
+    def find_first_appearance(self, video_path, coarse_interval_seconds=4.0, process_every_n_frames=15,
+                              min_coverage=1.0, hit_threshold=None, save_matches=True, refine=False):
+        """
+        Existence query: does the reference appear anywhere in the video?
+        Visits the sample grid (every process_every_n_frames frames) in
+        progressive order - one frame per coarse_interval_seconds first, then
+        bisecting the gaps - and stops at the first match >= hit_threshold
+        (default: confidence_threshold) or once min_coverage (0-1) of the
+        grid has been visited. refine=True also bisects the hit's appearance
+        boundaries (see refine_appearances).
+        """
+        try:
+            if self.reference_face is None:
+                return {"error": "No reference face loaded"}
+
+            if not os.path.exists(video_path):
+                return {"error": "Video file not found"}
+
+            cap = cv2.VideoCapture(video_path)
+            if not cap.isOpened():
+                return {"error": "Could not open video"}
+            self._reset_job_stats()
+
+            start_time = time.time()
+            if hit_threshold is None:
+                hit_threshold = self.confidence_threshold
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            coarse_step = max(1, int(round(fps * coarse_interval_seconds)))
+
+            if total_frames > 0:
+                grid_size = (total_frames + process_every_n_frames - 1) // process_every_n_frames
+                order = progressive_sample_order(total_frames, coarse_step, process_every_n_frames)
+            else:
+                # Unknown length (e.g. some streams): fall back to front-to-back sampling
+                grid_size = 0
+                order = (i * process_every_n_frames for i in range(10 ** 9))
+
+            logger.info("Existence query started", extra=fields(video=os.path.basename(video_path),
+                                                                frames=total_frames, coarseStep=coarse_step))
+
+            first_hit = None
+            visited = 0
+            frames_decoded = 0
+            faces_detected = 0
+            position = 0
+            for frame_idx in order:
+                ret, frame, position, decoded = self._read_frame_at(cap, frame_idx, position)
+                frames_decoded += decoded
+                if not ret:
+                    if grid_size == 0:
+                        break
+                    continue
+                visited += 1
+
+                matches, faces_found, _ = self._scan_frame(frame, frame_idx, fps, save_matches)
+                faces_detected += faces_found
+                hits = [m for m in matches if m["confidence"] >= hit_threshold]
+                if hits:
+                    first_hit = max(hits, key=lambda m: m["confidence"])
+                    break
+
+                if grid_size and visited / grid_size >= min_coverage:
+                    break
+
+            cap.release()
+            elapsed = time.time() - start_time
+            coverage = (100.0 * visited / grid_size) if grid_size else 0.0
+
+            summary = {
+                "mode": "exists",
+                "matchFound": first_hit is not None,
+                "firstHit": first_hit,
+                "timestamps": [first_hit] if first_hit else [],
+                "coveragePercent": round(coverage, 2),
+                "samplesVisited": visited,
+                "sampleGridSize": grid_size,
+                "framesDecoded": frames_decoded,
+                "totalFacesDetected": faces_detected,
+                "totalFrames": total_frames,
+                "elapsedSeconds": round(elapsed, 2),
+                "confidenceThreshold": hit_threshold,
+                "method": "Existence query: progressive sampling, stop at first high-confidence match",
+                "note": "firstHit is the first match encountered in progressive order, not necessarily the earliest appearance."
+            }
+            summary.update(self._job_stats())
+            if refine and first_hit is not None:
+                summary["appearances"] = self.refine_appearances(video_path, [first_hit], process_every_n_frames)
+
+            logger.info("Existence query finished", extra=fields(found=first_hit is not None,
+                                                                 coveragePercent=round(coverage, 1),
+                                                                 seconds=round(elapsed, 1)))
+            return summary
+
+        except Exception as e:
+            return {"error": f"Video analysis error: {e}"}
+
+    # -------------------------
+    # Appearance refinement
+    # -------------------------
+    def _verify_presence(self, frame, box_hint, template, threshold, track_threshold=0.5, search_radius=1.0):
+        """
+        Is the reference present in this frame? Tracker-assisted: first look for
+        the last known face (template) inside an expanded ROI around box_hint and
+        strictly score the tracked crop; fall back to detection, keeping only
+        faces within search_radius box sizes of box_hint, so the answer is about
+        the same track and not whoever else scores high in the frame.
+        Returns (present, box, confidence).
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        if template is not None and box_hint is not None:
+            x, y, w, h = box_hint
+            rx0, ry0 = max(0, x - w), max(0, y - h)
+            rx1, ry1 = min(gray.shape[1], x + 2 * w), min(gray.shape[0], y + 2 * h)
+            roi = gray[ry0:ry1, rx0:rx1]
+            th, tw = template.shape[:2]
+            if roi.shape[0] >= th and roi.shape[1] >= tw:
+                res = cv2.matchTemplate(roi, template, cv2.TM_CCOEFF_NORMED)
+                _, score, _, loc = cv2.minMaxLoc(res)
+                if score >= track_threshold:
+                    tx, ty = rx0 + loc[0], ry0 + loc[1]
+                    confidence, _ = self.compare_faces_strict(gray[ty:ty+th, tx:tx+tw])
+                    if confidence >= threshold:
+                        return True, (tx, ty, tw, th), confidence
+
+        best = (False, None, 0.0)
+        for box in self.detect_faces(gray, frame):
+            if box_hint is not None and not boxes_near(box, box_hint, search_radius):
+                continue
+            face, (x0, y0, x1, y1) = self.crop_face(gray, box)
+            confidence, _ = self.compare_faces_strict(face)
+            if confidence >= threshold and confidence > best[2]:
+                best = (True, (x0, y0, x1 - x0, y1 - y0), confidence)
+        return best
+
+    def _find_boundary(self, cap, state, known_frame, known_box, template, direction, limit_frame,
+                       initial_step, threshold):
+        """
+        Gallop from a known-present frame in direction (-1/+1) until an absent
+        frame (or limit_frame) is found, then bisect the bracket down to one
+        frame. Assumes the appearance is contiguous inside the bracket.
+        Returns (boundary_frame, reached_limit).
+        """
+        present_frame, present_box = known_frame, known_box
+        absent_frame = None
+        step = max(1, initial_step)
+
+        while absent_frame is None:
+            probe = present_frame + direction * step
+            if (direction < 0 and probe <= limit_frame) or (direction > 0 and probe >= limit_frame):
+                probe = limit_frame
+            if probe == present_frame:
+                return present_frame, True
+
+            ok, frame, state["position"], decoded = self._read_frame_at(cap, probe, state["position"])
+            state["decodes"] += decoded
+            present = False
+            if ok:
+                present, box, _ = self._verify_presence(frame, present_box, template, threshold)
+            if present:
+                present_frame, present_box = probe, box
+                if probe == limit_frame:
+                    return present_frame, True
+                step *= 2
+            else:
+                absent_frame = probe
+
+        while abs(absent_frame - present_frame) > 1:
+            mid = (absent_frame + present_frame) // 2
+            ok, frame, state["position"], decoded = self._read_frame_at(cap, mid, state["position"])
+            state["decodes"] += decoded
+            present = False
+            if ok:
+                present, box, _ = self._verify_presence(frame, present_box, template, threshold)
+            if present:
+                present_frame, present_box = mid, box
+            else:
+                absent_frame = mid
+
+        return present_frame, False
+
+    def refine_appearances(self, video_path, matches, sample_step, max_search_seconds=30.0, verify_threshold=None):
+        """
+        Turn sampled matches into precise appearances: matches closer than two
+        sample steps are grouped, then the first/last frame of each group is
+        located by galloping + bisection with seeks instead of a dense rescan.
+        Returns a list of appearance dicts.
+        """
+        if not matches:
+            return []
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            return []
+
+        try:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            last_frame = total_frames - 1 if total_frames > 0 else max(m["frame"] for m in matches) + sample_step
+            max_search = max(1, int(round(fps * max_search_seconds)))
+            if verify_threshold is None:
+                verify_threshold = self.confidence_threshold
+
+            appearances = []
+            for group in group_appearances(matches, 2 * sample_step):
+                state = {"position": 0, "decodes": 0}
+                head, tail = group[0], group[-1]
+
+                templates = []
+                for anchor in (head, tail):
+                    ok, frame, state["position"], decoded = self._read_frame_at(cap, anchor["frame"], state["position"])
+                    state["decodes"] += decoded
+                    if ok:
+                        x, y, w, h = anchor["box"]
+                        templates.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)[y:y+h, x:x+w].copy())
+                    else:
+                        templates.append(None)
+
+                first, first_open = self._find_boundary(
+                    cap, state, head["frame"], tuple(head["box"]), templates[0], -1,
+                    max(0, head["frame"] - max_search), sample_step // 2, verify_threshold)
+                last, last_open = self._find_boundary(
+                    cap, state, tail["frame"], tuple(tail["box"]), templates[1], +1,
+                    min(last_frame, tail["frame"] + max_search), sample_step // 2, verify_threshold)
+
+                appearances.append({
+                    "firstFrame": first,
+                    "lastFrame": last,
+                    "start": self.format_timestamp(first / fps),
+                    "end": self.format_timestamp(last / fps),
+                    "startSeconds": round(first / fps, 3),
+                    "endSeconds": round(last / fps, 3),
+                    "peakConfidence": max(m["confidence"] for m in group),
+                    "sampledMatches": len(group),
+                    "startAtSearchLimit": first_open,
+                    "endAtSearchLimit": last_open,
+                    "decodes": state["decodes"]
+                })
+                logger.debug("Appearance refined", extra=fields(start=self.format_timestamp(first / fps),
+                                                                end=self.format_timestamp(last / fps),
+                                                                firstFrame=first, lastFrame=last,
+                                                                decodes=state['decodes']))
+            return appearances
+        finally:
+            cap.release()
+
 
 # -------------------------
 # Example usage (run as script)
@@ -463,11 +1297,14 @@ if __name__ == "__main__":
     ref_path = "reference.jpg"   # path to your reference image
     video_path = "input_video.mp4"  # path to video to analyze
 
+    from logging_setup import configure_logging
+    configure_logging(fmt="text")
     analyzer = SimpleFaceAnalyzer(confidence_threshold=85, min_face_size=90, debug_save=True)
     ok, msg = analyzer.load_reference_face(ref_path)
     print("Load reference:", ok, msg)
     if ok:
         result = analyzer.analyze_video(video_path, process_every_n_frames=10, save_matches=True)
         print("Result:", result)
+        analyzer.debug_writer.close()  # finish pending debug writes before exit
     else:
         print("Failed to load reference; aborting.")
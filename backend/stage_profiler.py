@@ -0,0 +1,83 @@
+# stage_profiler.py
+"""
+Always-on per-stage timing for the analysis hot path (decode, detection,
+feature extraction, template, SSIM, FaceNet, ...). Each timed block costs
+two perf_counter() calls and a few dict/list operations, so it can stay on
+in production. Timings are kept per thread, so concurrent analysis jobs
+report their own numbers; p95 comes from a bounded reservoir sample per
+stage, keeping memory flat on long videos. An optional metrics histogram
+(labelled by stage) also aggregates every run across jobs for /api/metrics.
+"""
+import random
+import threading
+import time
+
+import numpy as np
+
+
+class _StageTimer:
+    __slots__ = ("_profiler", "_stage", "_start")
+
+    def __init__(self, profiler, stage):
+        self._profiler = profiler
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.add(self._stage, time.perf_counter() - self._start)
+        return False
+
+
+class StageProfiler:
+    def __init__(self, max_samples=1024, metric=None):
+        self.max_samples = max_samples
+        self.metric = metric
+        self._local = threading.local()
+
+    def stage(self, name):
+        """Context manager timing one run of stage name"""
+        return _StageTimer(self, name)
+
+    def add(self, name, seconds):
+        """Record one run of stage name that took seconds"""
+        if self.metric is not None:
+            self.metric.observe(seconds, stage=name)
+        stages = self._stages()
+        record = stages.get(name)
+        if record is None:
+            record = stages[name] = [0, 0.0, []]
+        record[0] += 1
+        record[1] += seconds
+        samples = record[2]
+        if len(samples) < self.max_samples:
+            samples.append(seconds)
+        else:
+            # Reservoir sampling: every run has the same chance to be kept
+            slot = random.randrange(record[0])
+            if slot < self.max_samples:
+                samples[slot] = seconds
+
+    def reset(self):
+        self._local.stages = {}
+
+    def summary(self):
+        """Per stage: count, totalMs, meanMs and p95Ms (in first-recorded order)"""
+        summary = {}
+        for name, (count, total, samples) in self._stages().items():
+            summary[name] = {
+                "count": count,
+                "totalMs": round(total * 1000.0, 2),
+                "meanMs": round(total * 1000.0 / count, 3),
+                "p95Ms": round(float(np.percentile(samples, 95)) * 1000.0, 3),
+            }
+        return summary
+
+    def _stages(self):
+        stages = getattr(self._local, 'stages', None)
+        if stages is None:
+            self.reset()
+            stages = self._local.stages
+        return stages
@@ -0,0 +1,258 @@
+# uploads.py
+"""
+Resumable chunked uploads for large videos: init -> put chunks by byte
+offset -> complete. Chunks are appended to <upload_id>.part and fed to a
+running sha256 as they arrive, so the content hash is ready the moment the
+last byte lands (no second pass over a multi-GB file). Chunks must arrive in
+order; a client that lost its connection asks for the current offset and
+continues from there. watch() gives readers (see growing_capture.py) a view
+of an upload that is still arriving, so analysis can follow the file as it
+grows.
+
+Completed uploads leave the live registry (the last few are remembered so a
+retried complete still answers). Uploads that receive nothing for
+max_age_seconds are swept: their state is dropped and their partial files
+deleted. Sweeps run from init(), at most once per SWEEP_INTERVAL.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+READ_BLOCK = 1024 * 1024
+SWEEP_INTERVAL = 600.0
+
+
+class UploadError(ValueError):
+    """Client-side upload problem (bad id, wrong offset, size mismatch, ...)"""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploads:
+    def __init__(self, directory, max_age_seconds=24 * 3600, max_completed=256):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        self.max_completed = max_completed
+        os.makedirs(directory, exist_ok=True)
+        self._uploads = {}
+        self._completed = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def init(self, filename, total_size=None):
+        """Start an upload; returns its state dict (uploadId, offset, size)"""
+        if time.time() - self._last_sweep >= SWEEP_INTERVAL:
+            self.sweep()
+        upload_id = uuid.uuid4().hex
+        state = {"uploadId": upload_id, "filename": filename, "size": total_size, "offset": 0}
+        open(self._part_path(upload_id), 'wb').close()
+        with open(self._meta_path(upload_id), 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        upload = self._runtime(state, hashlib.sha256())
+        with self._lock:
+            self._uploads[upload_id] = upload
+        return self._public(upload)
+
+    def status(self, upload_id):
+        upload = self._get(upload_id)
+        return self._public(upload)
+
+    def watch(self, upload_id):
+        """Read-side view of an upload for consumers following the growing file"""
+        return UploadWatch(self, self._get(upload_id))
+
+    def put(self, upload_id, offset, stream):
+        """
+        Append the chunk read from stream (file-like) at byte offset.
+        Returns the new offset. A wrong offset raises UploadError (409)
+        carrying the offset the client should resume from.
+        """
+        upload = self._get(upload_id)
+        with upload["lock"]:
+            self._check_live(upload)
+            if upload.get("path"):
+                raise UploadError("Upload already completed", status=409, offset=upload["offset"])
+            if offset != upload["offset"]:
+                raise UploadError(f"Expected offset {upload['offset']}, got {offset}",
+                                  status=409, offset=upload["offset"])
+            size = upload["size"]
+            with open(self._part_path(upload_id), 'ab') as f:
+                while True:
+                    block = stream.read(READ_BLOCK)
+                    if not block:
+                        break
+                    if size is not None and upload["offset"] + len(block) > size:
+                        raise UploadError("Chunk goes past the declared upload size", offset=upload["offset"])
+                    f.write(block)
+                    f.flush()
+                    upload["hasher"].update(block)
+                    upload["offset"] += len(block)
+                    upload["changed"].notify_all()
+            return upload["offset"]
+
+    def complete(self, upload_id, destination, expected_sha256=None):
+        """
+        Finish the upload: check size / optional client hash, move the file to
+        destination. Returns (destination, sha256 hex digest).
+        """
+        upload = self._get(upload_id)
+        with upload["lock"]:
+            self._check_live(upload)
+            if upload.get("path"):
+                return upload["path"], upload["sha256"]
+            if upload["size"] is not None and upload["offset"] != upload["size"]:
+                raise UploadError(f"Upload incomplete: {upload['offset']} of {upload['size']} bytes",
+                                  status=409, offset=upload["offset"])
+            digest = upload["hasher"].hexdigest()
+            if expected_sha256 and expected_sha256.lower() != digest:
+                raise UploadError("sha256 mismatch", status=422)
+            os.replace(self._part_path(upload_id), destination)
+            os.remove(self._meta_path(upload_id))
+            upload.update(path=destination, sha256=digest, hasher=None)
+            upload["changed"].notify_all()
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+            self._completed[upload_id] = upload
+            while len(self._completed) > self.max_completed:
+                self._completed.popitem(last=False)
+        return destination, digest
+
+    def sweep(self, now=None):
+        """
+        Forget uploads with no new data for max_age_seconds and delete their
+        partial files, including ones left on disk by an earlier process.
+        Returns the number of uploads removed.
+        """
+        now = time.time() if now is None else now
+        self._last_sweep = now
+        upload_ids = {name.split('.', 1)[0] for name in os.listdir(self.directory)
+                      if name.endswith(('.part', '.json'))}
+        removed = 0
+        for upload_id in upload_ids:
+            if not UPLOAD_ID_PATTERN.match(upload_id) or now - self._last_activity(upload_id) < self.max_age_seconds:
+                continue
+            with self._lock:
+                upload = self._uploads.get(upload_id)
+                # A chunk being written right now is activity: leave it for the next sweep
+                if upload is not None and not upload["lock"].acquire(blocking=False):
+                    continue
+                try:
+                    if upload is not None:
+                        upload["expired"] = True
+                    self._uploads.pop(upload_id, None)
+                    for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+                        try:
+                            os.remove(path)
+                        except FileNotFoundError:
+                            pass
+                finally:
+                    if upload is not None:
+                        upload["lock"].release()
+            removed += 1
+        return removed
+
+    def _last_activity(self, upload_id):
+        """mtime of the newest of the upload's files (the partial file grows with every chunk)"""
+        times = []
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                times.append(os.path.getmtime(path))
+            except FileNotFoundError:
+                pass
+        return max(times, default=0.0)
+
+    def _get(self, upload_id):
+        if not UPLOAD_ID_PATTERN.match(upload_id or ''):
+            raise UploadError("Invalid upload id")
+        with self._lock:
+            upload = self._uploads.get(upload_id) or self._completed.get(upload_id)
+            if upload is None:
+                upload = self._uploads[upload_id] = self._recover(upload_id)
+            return upload
+
+    @staticmethod
+    def _check_live(upload):
+        # Caller holds upload["lock"]; a sweep may have expired the upload since _get
+        if upload.get("expired"):
+            raise UploadError("Unknown upload id", status=404)
+
+    def _recover(self, upload_id):
+        """Rebuild an upload's state after a restart by re-hashing its partial file"""
+        try:
+            with open(self._meta_path(upload_id), encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Unknown upload id", status=404)
+        hasher = hashlib.sha256()
+        offset = 0
+        with open(self._part_path(upload_id), 'rb') as f:
+            for block in iter(lambda: f.read(READ_BLOCK), b''):
+                hasher.update(block)
+                offset += len(block)
+        return self._runtime(dict(state, offset=offset), hasher)
+
+    @staticmethod
+    def _runtime(state, hasher):
+        lock = threading.Lock()
+        return dict(state, hasher=hasher, lock=lock, changed=threading.Condition(lock))
+
+    @staticmethod
+    def _public(upload):
+        return {"uploadId": upload["uploadId"], "filename": upload["filename"], "size": upload["size"],
+                "offset": upload["offset"], "complete": bool(upload.get("path"))}
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.directory, upload_id + ".part")
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.directory, upload_id + ".json")
+
+
+class UploadWatch:
+    """
+    Follows one upload while it is being written: the file to read (the
+    partial file until completion, then its destination), how many bytes are
+    on disk, and a wait for more to arrive.
+    """
+
+    def __init__(self, uploads, upload):
+        self._uploads = uploads
+        self._upload = upload
+
+    @property
+    def upload_id(self):
+        return self._upload["uploadId"]
+
+    @property
+    def path(self):
+        return self._upload.get("path") or self._uploads._part_path(self.upload_id)
+
+    @property
+    def size(self):
+        return self._upload["offset"]
+
+    @property
+    def complete(self):
+        return bool(self._upload.get("path"))
+
+    @property
+    def sha256(self):
+        return self._upload.get("sha256")
+
+    def wait(self, size, timeout=None):
+        """
+        Block until more than size bytes are on disk or the upload completes.
+        Returns False if neither happened within timeout seconds.
+        """
+        upload = self._upload
+        with upload["changed"]:
+            return bool(upload["changed"].wait_for(lambda: upload["offset"] > size or upload.get("path"), timeout))
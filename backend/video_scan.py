@@ -0,0 +1,87 @@
+# video_scan.py
+"""
+Frame-index planning helpers for the sampled video scan modes of
+SimpleFaceAnalyzer (coarse-to-fine windows, progressive ordering, ...).
+All helpers work on integer frame indices (and [x, y, w, h] boxes) and
+never touch the video.
+"""
+
+
+def merge_windows(windows):
+    """Merge overlapping / touching [start, end] frame windows (inclusive)"""
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(w) for w in merged]
+
+
+def windows_around(hit_frames, radius, total_frames=0):
+    """
+    Build merged windows of +/- radius frames around each hit frame,
+    clamped to [0, total_frames-1] when the frame count is known.
+    """
+    last = total_frames - 1 if total_frames > 0 else None
+    windows = []
+    for frame in hit_frames:
+        start = max(0, frame - radius)
+        end = frame + radius if last is None else min(last, frame + radius)
+        windows.append((start, end))
+    return merge_windows(windows)
+
+
+def progressive_sample_order(total_frames, coarse_step, fine_step=1):
+    """
+    Yield every multiple of fine_step below total_frames exactly once,
+    coarse stride first and then repeatedly bisecting the remaining gaps,
+    so early termination still leaves the visited points evenly spread.
+    """
+    fine_step = max(1, int(fine_step))
+    n = (total_frames + fine_step - 1) // fine_step
+    stride = max(1, int(coarse_step) // fine_step)
+    seen = bytearray(n)
+    while True:
+        for i in range(0, n, stride):
+            if not seen[i]:
+                seen[i] = 1
+                yield i * fine_step
+        if stride == 1:
+            break
+        stride = (stride + 1) // 2
+
+
+def boxes_near(a, b, radius=1.5):
+    """True if the centres of boxes a and b are at most radius x the larger box side apart"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    dx = (ax + aw / 2.0) - (bx + bw / 2.0)
+    dy = (ay + ah / 2.0) - (by + bh / 2.0)
+    return dx * dx + dy * dy <= (radius * max(aw, ah, bw, bh)) ** 2
+
+
+def group_appearances(matches, max_gap_frames, radius=1.0):
+    """
+    Group sampled matches (dicts with "frame" and "box" keys) into
+    appearances, i.e. tracks: a match joins the most recent group whose last
+    match is no more than max_gap_frames earlier and whose last box is near
+    its own (see boxes_near), so two people matched in the same stretch of
+    video stay separate appearances. Matches without a box group by frame
+    only. Returns a list of lists of matches, in frame order.
+    """
+    groups = []
+    for match in sorted(matches, key=lambda m: m["frame"]):
+        for group in reversed(groups):
+            last = group[-1]
+            if match["frame"] - last["frame"] > max_gap_frames:
+                continue
+            if last["frame"] == match["frame"]:
+                continue  # another face in the same frame
+            if match.get("box") is None or last.get("box") is None or boxes_near(match["box"], last["box"], radius):
+                group.append(match)
+                break
+        else:
+            groups.append([match])
+    groups.sort(key=lambda group: group[0]["frame"])
+    return groups